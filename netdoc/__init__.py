@@ -1,6 +1,8 @@
 from extras.plugins import PluginConfig
 from django.conf import settings
+import logging
 import os
+import sys
 
 PLUGIN_SETTINGS = settings.PLUGINS_CONFIG.get('netdoc', {})
 
@@ -13,10 +15,68 @@ class NetdocConfig(PluginConfig):
     author_email = 'andrea.dainese@pm.me'
     base_url = 'netdoc'
     required_settings = ['NTC_TEMPLATES_DIR']
+    queues = ['ingest'] # RQ queue netdoc.ingest (see INGEST_QUEUE)
     default_settings = {
-        'NTC_TEMPLATES_DIR': '/opt/ntc-templates/ntc_templates/templates'
+        'NTC_TEMPLATES_DIR': '/opt/ntc-templates/ntc_templates/templates',
+        'COLLECTOR': 'nornir', # nornir, asyncio or replay
+        'REPLAY_PATH': None, # Captured outputs directory or archive (replay collector)
+        'SSH_PORT': 22, # SSH port of all devices
+        'SIMULATOR_NETWORK': '127.1.0.0/16', # Loopback addresses of simulated devices
+        'MAX_SESSIONS': 1000, # Concurrent SSH sessions (asyncio collector)
+        'NUM_WORKERS': 100, # Concurrent hosts (nornir collector)
+        'MIN_SESSIONS': 10, # Adaptive concurrency lower bound
+        'SLOWDOWN_THRESHOLD': 3, # Reduce concurrency when commands are slower than usual by this ratio
+        'READ_TIMEOUT_DEFAULT': 120, # Seconds, for commands without history
+        'READ_TIMEOUT_FACTOR': 3, # Read timeout is this factor times the longest recent duration
+        'READ_TIMEOUT_MIN': 10, # Seconds
+        'READ_TIMEOUT_MAX': 600, # Seconds
+        'READ_TIMEOUT_HISTORY': 30, # Days of command durations used for read timeouts
+        'READ_TIMEOUT_CACHE': 3600, # Seconds command durations are cached
+        'CREDENTIAL_LOGIN_RATE': None, # New logins per second per credential (None: unlimited)
+        'CREDENTIAL_SESSIONS': None, # Concurrent sessions per credential (None: unlimited)
+        'SITE_LOGIN_RATE': None, # New logins per second per site (None: unlimited)
+        'SITE_SESSIONS': None, # Concurrent sessions per site (None: unlimited)
+        'INGEST_WORKERS': 1, # Parse/ingest threads
+        'INGEST_QUEUE_SIZE': 100, # Hosts waiting to be ingested before collectors are blocked
+        'INGEST_QUEUE': None, # RQ queue of ingestion jobs, e.g. netdoc.ingest (None: ingest in collection jobs)
+        'RAW_OUTPUT_COMPRESSION': 'zlib', # zlib or zstd (requires zstandard)
+        'RAW_OUTPUT_COMPRESSION_LEVEL': 6, # zlib 1-9, zstd 1-22
+        'SKIP_UNCHANGED': False, # Skip parsing and ingestion (except volatile commands) of outputs identical to the previous ones
+        'LOG_RETENTION_DAYS': None, # Delete logs older than days (None: no age limit, see retention)
+        'LOG_RETENTION_LOGS': None, # But keep the latest logs of each command and device (None: keep none)
+        'PRUNE_BATCH_SIZE': 10000, # Logs deleted per query
+        'TEXTFSM_CHECK_INTERVAL': 30, # Seconds between checks of NTC_TEMPLATES_DIR changes (see textfsm_cache)
+        'SHARD_BY': None, # None or site
+        'SHARD_SIZE': 100, # Max addresses per interactive discovery job
+        'INTERACTIVE_QUEUE': 'high', # RQ queue of discoveries requested from a Discoverable page
+        'SCHEDULED_QUEUE': 'low', # RQ queue of scheduled discoveries
+        'SCHEDULED_SHARD_SIZE': 10, # Max addresses per non interactive (bulk and scheduled) discovery job (bounds the wait of interactive jobs)
+        'LEASE_TTL': 3600, # Seconds a run holds a Discoverable if not released (crashed worker)
+        'LEASE_WAIT': 600, # Seconds a run defers a Discoverable leased by another run before failing it
+        'PREFLIGHT': True, # Probe SSH port before discovery
+        'PREFLIGHT_TIMEOUT': 3, # Seconds
+        'DEFAULT_PROFILE': 'full', # Command profile (see registry)
+        'PROFILES': {}, # Additional command profiles
+        'SITE_PROFILES': {}, # Site slug: command profile
+        'SCHEDULES': {}, # Command profile: interval in seconds (e.g. {'l2-fast': 600, 'routing': 3600, 'full': 86400})
+        'SCHEDULE_JITTER': 0.1, # Max per device offset, as a fraction of the interval
+        'SCHEDULE_TICK': 60, # Seconds between scheduler checks
+        'FINGERPRINT': True, # Skip configuration derived commands on unchanged devices
+        'FINGERPRINT_MAX_AGE': 86400, # Seconds after which skipped commands are collected anyway (None: no limit)
+        'SESSION_POOL': False, # Reuse Netmiko sessions across jobs (requires non forking RQ workers)
+        'SESSION_POOL_IDLE_TIMEOUT': 300, # Seconds
     }
 
+    def ready(self):
+        super().ready()
+        if 'rqworker' in sys.argv:
+            # Compile TextFSM templates before forking jobs (see textfsm_cache)
+            from . import textfsm_cache
+            try:
+                logging.info(f'Compiled {textfsm_cache.warm()} TextFSM templates')
+            except Exception as err:
+                logging.error(f'Cannot compile TextFSM templates: {err}')
+
 
 config = NetdocConfig
 
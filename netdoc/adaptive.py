@@ -0,0 +1,168 @@
+"""
+Adaptive concurrency and timeouts.
+
+Collectors measure how long each command takes and compare it with the
+duration stored for the same Discoverable and command (DiscoveryLog.duration,
+aggregated once per READ_TIMEOUT_CACHE seconds and cached):
+
+* read timeouts are derived from historical durations (READ_TIMEOUT_FACTOR
+  times the longest recent duration, between READ_TIMEOUT_MIN and
+  READ_TIMEOUT_MAX), so large outputs do not time out while small commands
+  fail fast;
+* the concurrency limit follows an additive increase/multiplicative decrease
+  policy: it is reduced when commands or logins are more than
+  SLOWDOWN_THRESHOLD times slower than expected (device CPU or AAA
+  overloaded) or fail, and slowly increased otherwise.
+"""
+import asyncio
+import datetime
+import threading
+from django.core.cache import cache
+from django.db.models import Avg, Max
+from django.utils import timezone
+from netmiko import __version__ as netmiko_version
+from . import PLUGIN_SETTINGS
+from . import models
+
+
+HISTORY_KEY = "netdoc:history:{}"
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit between minimum and maximum, starting from maximum.
+    """
+
+    def __init__(self, maximum, minimum=None):
+        if not minimum:
+            minimum = PLUGIN_SETTINGS.get('MIN_SESSIONS')
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.limit = maximum
+        self.login_latency = None #: Moving average of login latency
+        self.lock = threading.Lock()
+
+    def update(self, slowdown=None, failed=False):
+        """
+        Update the limit after a command. Slowdown is the ratio between the
+        observed and expected latency (None if unknown).
+        """
+        with self.lock:
+            if failed or (slowdown and slowdown > PLUGIN_SETTINGS.get('SLOWDOWN_THRESHOLD')):
+                self.limit = max(self.minimum, int(self.limit * 0.75))
+            elif self.limit < self.maximum:
+                self.limit = self.limit + 1
+
+    def login_slowdown(self, latency):
+        """
+        Return the ratio between a login latency and the average one.
+        """
+        with self.lock:
+            if self.login_latency is None:
+                self.login_latency = latency
+                return 1.0
+            slowdown = latency / self.login_latency if self.login_latency else 1.0
+            self.login_latency = 0.9 * self.login_latency + 0.1 * latency
+            return slowdown
+
+
+class AsyncLimiter:
+    """
+    Asyncio semaphore following an AdaptiveLimit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.limit.limit)
+            self.active = self.active + 1
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        async with self.condition:
+            self.active = self.active - 1
+            self.condition.notify_all()
+
+
+class ThreadLimiter:
+    """
+    Threading semaphore following an AdaptiveLimit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.active < self.limit.limit)
+            self.active = self.active + 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.condition:
+            self.active = self.active - 1
+            self.condition.notify_all()
+
+
+def load_history(discoverable_ids):
+    """
+    Return average and longest recent durations as
+    {discoverable_id: {command name: (average, longest)}}. Durations of each
+    Discoverable are aggregated from the logs at most once every
+    READ_TIMEOUT_CACHE seconds (shared cache).
+    """
+    keys = {HISTORY_KEY.format(discoverable_id): discoverable_id for discoverable_id in discoverable_ids}
+    history = {keys[key]: value for key, value in cache.get_many(keys.keys()).items()}
+    missing = [discoverable_id for discoverable_id in discoverable_ids if discoverable_id not in history]
+    if not missing:
+        return history
+
+    since = timezone.now() - datetime.timedelta(days=PLUGIN_SETTINGS.get('READ_TIMEOUT_HISTORY'))
+    rows = models.DiscoveryLog.objects.filter(
+        discoverable_id__in=missing, success=True, duration__isnull=False, created__gte=since
+    ).values('discoverable_id', 'request', 'command').annotate(average=Avg('duration'), longest=Max('duration'))
+
+    loaded = {discoverable_id: {} for discoverable_id in missing}
+    for row in rows:
+        # Per VRF commands share the request (see registry.Command)
+        name = row['request'] if row['command'] == row['request'] else f"{row['request']}|{row['command']}"
+        loaded[row['discoverable_id']][name] = (row['average'], row['longest'])
+    cache.set_many({HISTORY_KEY.format(discoverable_id): value for discoverable_id, value in loaded.items()}, PLUGIN_SETTINGS.get('READ_TIMEOUT_CACHE'))
+    history.update(loaded)
+    return history
+
+
+def get_timeout(history, name):
+    """
+    Return expected duration (None if unknown) and read timeout of a command
+    (by name, see registry.Command).
+    """
+    average, longest = history.get(name, (None, None))
+    if longest is None:
+        return None, PLUGIN_SETTINGS.get('READ_TIMEOUT_DEFAULT')
+    timeout = PLUGIN_SETTINGS.get('READ_TIMEOUT_FACTOR') * longest
+    timeout = min(PLUGIN_SETTINGS.get('READ_TIMEOUT_MAX'), max(PLUGIN_SETTINGS.get('READ_TIMEOUT_MIN'), timeout))
+    return average, timeout
+
+
+def get_slowdown(duration, expected):
+    """
+    Return the ratio between observed and expected duration, None if unknown.
+    """
+    if not expected:
+        return None
+    return duration / expected
+
+
+def netmiko_timeout_kwargs(timeout):
+    """
+    Return Netmiko send_command arguments for a read timeout.
+    """
+    if int(netmiko_version.split('.')[0]) >= 4:
+        return {"read_timeout": timeout}
+    # Netmiko 3 waits up to max_loops (500) * 0.2s * delay_factor
+    return {"delay_factor": timeout / 100}
@@ -3,7 +3,7 @@ from rest_framework import serializers
 from ipam.api.serializers import NestedPrefixSerializer
 from dcim.api.serializers import NestedDeviceSerializer
 from netbox.api.serializers import NetBoxModelSerializer, WritableNestedSerializer
-from ..models import Credential, Discoverable, DiscoveryLog, ArpTableEntry, MacAddressTableEntry, RouteTableEntry 
+from ..models import Credential, Discoverable, DiscoveryLog, DiscoveryRun, ArpTableEntry, MacAddressTableEntry, RouteTableEntry 
 
 
 #
@@ -68,7 +68,20 @@ class DiscoverableSerializer(NetBoxModelSerializer):
     class Meta:
         model = Discoverable
         fields = (
-            'id', 'url', 'address', 'device', 'credential', 'mode', 'discoverylogs_count'
+            'id', 'url', 'address', 'device', 'credential', 'mode', 'profile', 'discoverylogs_count'
+        )
+
+
+class DiscoveryRunSerializer(NetBoxModelSerializer):
+    url = serializers.HyperlinkedIdentityField(
+        view_name='plugins-api:netdoc-api:discoveryrun-detail'
+    )
+    hosts_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = DiscoveryRun
+        fields = (
+            'id', 'url', 'created', 'last_updated', 'status', 'profile', 'queue', 'hosts_count'
         )
 
 
@@ -77,12 +90,22 @@ class DiscoveryLogSerializer(NetBoxModelSerializer):
         view_name='plugins-api:netdoc-api:discoverylog-detail'
     )
     discoverable = NestedDiscoverableSerializer()
+    raw_output = serializers.CharField(read_only=True)
 
     class Meta:
         model = DiscoveryLog
         fields = (
             'id', 'url', 'discoverable', 'configuration', 'parsed_output', 'raw_output', 'request', 'success', 'parsed', 'ingested'
         )
+        heavy_fields = ('parsed_output', 'raw_output') #: Omitted from lists unless included (see DiscoveryLogViewSet)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        include = self.context.get('include')
+        if include is not None:
+            for field in self.Meta.heavy_fields:
+                if field not in include:
+                    self.fields.pop(field)
 
 
 class RouteTableEntrySerializer(NetBoxModelSerializer):
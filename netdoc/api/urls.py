@@ -7,6 +7,7 @@ app_name = 'nedoc'
 router = NetBoxRouter()
 router.register('credentials', views.CredentialViewSet)
 router.register('discoverables', views.DiscoverableViewSet)
+router.register('discoveryruns', views.DiscoveryRunViewSet)
 router.register('discoverylogs', views.DiscoveryLogViewSet)
 
 urlpatterns = router.urls
@@ -1,9 +1,15 @@
 from django.db.models import Count
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.response import Response
 
 from netbox.api.viewsets import NetBoxModelViewSet
 
 from .. import models
-from .serializers import CredentialSerializer, DiscoverableSerializer, DiscoveryLogSerializer
+from .. import coordinator
+from .. import filtersets
+from .serializers import CredentialSerializer, DiscoverableSerializer, DiscoveryLogSerializer, DiscoveryRunSerializer
 
 
 class CredentialViewSet(NetBoxModelViewSet):
@@ -21,7 +27,69 @@ class DiscoverableViewSet(NetBoxModelViewSet):
     # filterset_class = filtersets.AccessListRuleFilterSet
 
 
+class DiscoveryRunViewSet(NetBoxModelViewSet):
+    queryset = models.DiscoveryRun.objects.prefetch_related('tags').annotate(
+        hosts_count=Count('hosts')
+    )
+    serializer_class = DiscoveryRunSerializer
+
+    def create(self, request, *args, **kwargs):
+        # Runs are created by discovery requests
+        raise MethodNotAllowed(request.method)
+
+    def update(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """
+        Cancel the run.
+        """
+        run = self.get_object()
+        coordinator.cancel(run.pk)
+        return Response(coordinator.status(run.pk))
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """
+        Resume hosts not completed.
+        """
+        run = self.get_object()
+        try:
+            coordinator.resume(run.pk)
+        except coordinator.RunInProgress as err:
+            return Response({'detail': str(err)}, status=status.HTTP_409_CONFLICT)
+        return Response(coordinator.status(run.pk))
+
+
 class DiscoveryLogViewSet(NetBoxModelViewSet):
+    """
+    Lists omit raw_output and parsed_output, include them with
+    ?include=raw_output,parsed_output.
+    """
     queryset = models.DiscoveryLog.objects.prefetch_related('discoverable', 'tags')
     serializer_class = DiscoveryLogSerializer
-    # filterset_class = filtersets.AccessListRuleFilterSet  
+    filterset_class = filtersets.DiscoveryLogFilterSet
+
+    def get_include(self):
+        """
+        Return the heavy fields to serialize (None: all).
+        """
+        if self.action != 'list':
+            return None
+        include = self.request.query_params.get('include', '')
+        return [field for field in include.split(',') if field in DiscoveryLogSerializer.Meta.heavy_fields]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        include = self.get_include()
+        if include is None or 'raw_output' in include:
+            queryset = queryset.prefetch_related('raw_output_blob')
+        if include is not None and 'parsed_output' not in include:
+            queryset = queryset.defer('parsed_output')
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include'] = self.get_include()
+        return context
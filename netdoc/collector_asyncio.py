@@ -0,0 +1,182 @@
+"""
+Asyncio collector.
+
+Execute the discovery_cisco_* command sets using Scrapli over asyncssh. Each
+device is a coroutine waiting on SSH reads, so thousands of sessions can be
+kept open on a single event loop. The number of concurrent sessions is limited
+by MAX_SESSIONS and reduced when logins or commands slow down (see adaptive).
+Per credential and per site limits are honoured (see ratelimit).
+
+Requires Scrapli: pip install scrapli[asyncssh]
+"""
+import asyncio
+import logging
+import time
+from . import PLUGIN_SETTINGS
+from . import models
+from . import registry
+from . import functions
+from . import adaptive
+from . import ratelimit
+from . import runs
+from .pipeline import Pipeline
+from . import discovery_cisco_ios, discovery_cisco_nxos, discovery_cisco_xr
+
+
+PLATFORMS = {
+    discovery_cisco_ios.PLATFORM: discovery_cisco_ios,
+    discovery_cisco_nxos.PLATFORM: discovery_cisco_nxos,
+    discovery_cisco_xr.PLATFORM: discovery_cisco_xr,
+}
+
+LOGIN_REQUEST = "ssh login" #: Request used for connection and login failure logs
+
+DRIVERS = {
+    "cisco_ios": "AsyncIOSXEDriver",
+    "cisco_nxos": "AsyncNXOSDriver",
+    "cisco_xr": "AsyncIOSXRDriver",
+}
+
+
+def get_driver(platform):
+    """
+    Return the Scrapli async driver class for a platform.
+    """
+    try:
+        from scrapli.driver import core
+    except ImportError:
+        raise ImportError('Asyncio collector requires Scrapli, install it with: pip install scrapli[asyncssh]')
+    return getattr(core, DRIVERS[platform])
+
+
+async def collect_host(discoverable, limiter, limits, history=None, profile=None, exclude=None, vrfs=None, canceled=None):
+    """
+    Connect to a Discoverable and execute the platform commands included in
+    the profile, except commands in exclude (per VRF commands use vrfs if
+    show vrf is excluded). Return a list of (request,
+    raw_output, duration) in execution order. Read timeouts are derived from
+    history (see adaptive). Nothing is collected if the canceled coroutine
+    returns True when the host starts.
+
+    Credential and Site must be already loaded (select_related), the ORM
+    cannot be used inside the event loop.
+    """
+    platform = "_".join(discoverable.mode.split("_")[1:])
+    platform_module = PLATFORMS[platform]
+    profile = profile or registry.profile_for(discoverable)
+    credential = discoverable.credential
+    driver = get_driver(platform)
+    history = history or {}
+    results = []
+
+    async def send_commands(conn, commands):
+        for command in commands:
+            expected, timeout = adaptive.get_timeout(history, command.name)
+            start = time.monotonic()
+            try:
+                response = await conn.send_command(command.command_string, timeout_ops=timeout)
+                raw_output = response.result
+                failed = False
+            except Exception as err:
+                # Logged as a failed command (see functions.INVALID_RE)
+                raw_output = f'% {err}'
+                failed = True
+            duration = time.monotonic() - start
+            limiter.limit.update(slowdown=adaptive.get_slowdown(duration, expected), failed=failed)
+            results.append((command.name, raw_output, duration))
+
+    async with ratelimit.async_session(discoverable.credential_id, discoverable.site_id, limits), limiter:
+        if canceled and await canceled():
+            return results
+        connected = False
+        start = time.monotonic()
+        try:
+            await ratelimit.async_login(discoverable.credential_id, discoverable.site_id, limits)
+            start = time.monotonic()
+            async with driver(
+                host=discoverable.address,
+                port=PLUGIN_SETTINGS.get('SSH_PORT'),
+                auth_username=credential.username,
+                auth_password=credential.password,
+                auth_secondary=credential.enable_password,
+                auth_strict_key=False,
+                transport="asyncssh",
+            ) as conn:
+                # SSH and AAA latency
+                connected = True
+                limiter.limit.update(slowdown=limiter.limit.login_slowdown(time.monotonic() - start))
+
+                skip_classes = set()
+                if registry.use_fingerprint(platform, profile=profile):
+                    await send_commands(conn, [platform_module.FINGERPRINT])
+
+                    # Skip configuration derived commands if the device is unchanged
+                    skip_classes = registry.get_skipped_classes(
+                        functions.fingerprint(results[-1][1]), discoverable.fingerprint, discoverable.last_discovered_by_class,
+                    )
+
+                await send_commands(conn, registry.select(platform_module.COMMANDS, profile=profile, skip_classes=skip_classes, exclude=exclude))
+
+                # Per VRF commands
+                vrf_output = next((raw_output for request, raw_output, duration in results if request == "show vrf"), None)
+                if vrf_output is not None:
+                    vrfs = platform_module.vrfs_from_output(vrf_output)
+                elif not vrfs:
+                    vrfs = platform_module.DEFAULT_VRFS
+                await send_commands(conn, registry.select(platform_module.vrf_commands(vrfs), profile=profile, skip_classes=skip_classes, exclude=exclude))
+        except Exception as err:
+            limiter.limit.update(failed=True)
+            logging.error(f'Failed to discover {discoverable}: {err}')
+            if not connected:
+                # Logged as a failed log (see functions.INVALID_RE), as Nornir failed hosts
+                results.append((LOGIN_REQUEST, f'% {err}', time.monotonic() - start))
+
+    return results
+
+
+async def collect(discoverables, pipeline, max_sessions=None, profile=None, history=None, run_id=None, exclude=None, vrfs=None):
+    """
+    Collect all Discoverables concurrently. Results of each host are put in
+    the pipeline as soon as the host completes. Hosts are skipped once the
+    run is canceled.
+    """
+    if not max_sessions:
+        max_sessions = PLUGIN_SETTINGS.get('MAX_SESSIONS')
+    limiter = adaptive.AsyncLimiter(adaptive.AdaptiveLimit(max_sessions))
+    limits = ratelimit.RateLimits(asyncio.Semaphore)
+    history = history or {}
+    exclude = exclude or {}
+    vrfs = vrfs or {}
+    loop = asyncio.get_running_loop()
+
+    async def canceled():
+        # The ORM cannot be used inside the event loop
+        return await loop.run_in_executor(None, runs.is_canceled, run_id)
+
+    async def collect_and_put(discoverable):
+        results = await collect_host(
+            discoverable, limiter, limits,
+            history=history.get(discoverable.pk), profile=profile, exclude=exclude.get(discoverable.pk), vrfs=vrfs.get(discoverable.pk), canceled=canceled,
+        )
+        # Pipeline.put blocks when the queue is full: run it outside the event loop
+        await loop.run_in_executor(None, pipeline.put, discoverable.pk, results)
+
+    await asyncio.gather(*[collect_and_put(discoverable) for discoverable in discoverables])
+
+
+def discovery(addresses, max_sessions=None, profile=None, run_id=None, exclude=None, vrfs=None):
+    """
+    Discovery devices using the asyncio collector. Commands in exclude
+    ({discoverable_id: names}) are skipped, VRF lists in vrfs
+    ({discoverable_id: vrfs}) are used if show vrf is skipped.
+    """
+    modes = [f'netmiko_{platform}' for platform in PLATFORMS]
+    discoverables = list(
+        models.Discoverable.objects.filter(discoverable=True, address__in=addresses, mode__in=modes).select_related('credential', 'site')
+    )
+
+    history = adaptive.load_history([discoverable.pk for discoverable in discoverables])
+
+    # Collect outputs from all devices, results are parsed and ingested while collecting
+    with Pipeline(run_id=run_id) as pipeline:
+        asyncio.run(collect(discoverables, pipeline, max_sessions=max_sessions, profile=profile, history=history, run_id=run_id, exclude=exclude, vrfs=vrfs))
@@ -0,0 +1,190 @@
+"""
+Replay collector.
+
+Execute the discovery_cisco_* command sets reading captured outputs instead of
+connecting to devices, so parsing and ingestion can be profiled or
+regression-tested offline. Captures are a directory, a tar archive (.tar,
+.tar.gz, .tgz) or a zip archive laid out as:
+
+    <address>/<command name>
+
+where command name is the Command name quoted with urllib.parse.quote (e.g.
+'show ip arp%7Cshow ip arp vrf x'). Commands without a captured output are
+skipped. Captures can be exported from the logs with capture().
+"""
+import os
+import tarfile
+import zipfile
+from urllib.parse import quote
+from . import PLUGIN_SETTINGS
+from . import models
+from . import registry
+from . import runs
+from .pipeline import Pipeline
+from . import discovery_cisco_ios, discovery_cisco_nxos, discovery_cisco_xr
+
+
+PLATFORMS = {
+    discovery_cisco_ios.PLATFORM: discovery_cisco_ios,
+    discovery_cisco_nxos.PLATFORM: discovery_cisco_nxos,
+    discovery_cisco_xr.PLATFORM: discovery_cisco_xr,
+}
+
+
+def get_filename(address, name):
+    """
+    Return the relative path of a captured output.
+    """
+    return f'{address}/{quote(name, safe=" ")}'
+
+
+class DirectorySource:
+    def __init__(self, path):
+        self.path = path
+
+    def addresses(self):
+        return [entry for entry in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, entry))]
+
+    def read(self, address, name):
+        try:
+            with open(os.path.join(self.path, get_filename(address, name)), encoding='utf-8') as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def close(self):
+        pass
+
+
+class TarSource:
+    def __init__(self, path):
+        self.archive = tarfile.open(path)
+        # Member names can start with ./
+        self.members = {os.path.normpath(member.name): member for member in self.archive.getmembers() if member.isfile()}
+
+    def addresses(self):
+        return sorted(set(name.split('/')[0] for name in self.members if '/' in name))
+
+    def read(self, address, name):
+        member = self.members.get(get_filename(address, name))
+        if not member:
+            return None
+        return self.archive.extractfile(member).read().decode('utf-8')
+
+    def close(self):
+        self.archive.close()
+
+
+class ZipSource:
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path)
+        self.names = set(self.archive.namelist())
+
+    def addresses(self):
+        return sorted(set(name.split('/')[0] for name in self.names if '/' in name))
+
+    def read(self, address, name):
+        filename = get_filename(address, name)
+        if filename not in self.names:
+            return None
+        return self.archive.read(filename).decode('utf-8')
+
+    def close(self):
+        self.archive.close()
+
+
+def open_source(path):
+    """
+    Return the source reading captured outputs from path.
+    """
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    return TarSource(path)
+
+
+def collect_host(discoverable, source, profile=None, exclude=None, vrfs=None):
+    """
+    Return the captured outputs of a Discoverable as a list of (request,
+    raw_output, duration), selecting commands as a live collector would,
+    except that the fingerprint does not skip configuration derived commands.
+    Commands in exclude are skipped (per VRF commands use vrfs if show vrf
+    is excluded).
+    """
+    platform = "_".join(discoverable.mode.split("_")[1:])
+    platform_module = PLATFORMS[platform]
+    profile = profile or registry.profile_for(discoverable)
+    results = []
+
+    def send_commands(commands):
+        for command in commands:
+            raw_output = source.read(discoverable.address, command.name)
+            if raw_output is not None:
+                # Durations are not replayed, so they do not affect read timeouts
+                results.append((command.name, raw_output, None))
+
+    if registry.use_fingerprint(platform, profile=profile):
+        send_commands([platform_module.FINGERPRINT])
+
+    # Captured outputs are replayed even if the fingerprint is unchanged
+    send_commands(registry.select(platform_module.COMMANDS, profile=profile, exclude=exclude))
+
+    # Per VRF commands
+    vrf_output = next((raw_output for request, raw_output, duration in results if request == "show vrf"), None)
+    if vrf_output is not None:
+        vrfs = platform_module.vrfs_from_output(vrf_output)
+    elif not vrfs:
+        vrfs = platform_module.DEFAULT_VRFS
+    send_commands(registry.select(platform_module.vrf_commands(vrfs), profile=profile, exclude=exclude))
+
+    return results
+
+
+def discovery(addresses=None, path=None, profile=None, run_id=None, exclude=None, vrfs=None):
+    """
+    Discovery devices from captured outputs. All captured addresses are
+    replayed if addresses is not set. Commands in exclude ({discoverable_id:
+    names}) are skipped, VRF lists in vrfs ({discoverable_id: vrfs}) are
+    used if show vrf is skipped.
+    """
+    if not path:
+        path = PLUGIN_SETTINGS.get('REPLAY_PATH')
+    source = open_source(path)
+    try:
+        if addresses is None:
+            addresses = source.addresses()
+        modes = [f'netmiko_{platform}' for platform in PLATFORMS]
+        discoverables = models.Discoverable.objects.filter(discoverable=True, address__in=addresses, mode__in=modes).select_related('credential', 'site')
+
+        # Results are parsed and ingested while reading
+        exclude = exclude or {}
+        vrfs = vrfs or {}
+        with Pipeline(run_id=run_id) as pipeline:
+            for discoverable in discoverables:
+                if runs.is_canceled(run_id):
+                    break
+                pipeline.put(discoverable.pk, collect_host(discoverable, source, profile=profile, exclude=exclude.get(discoverable.pk), vrfs=vrfs.get(discoverable.pk)))
+    finally:
+        source.close()
+
+
+def capture(path, addresses=None):
+    """
+    Export the latest successful output of each command and Discoverable to a
+    directory, in the replay layout. Return the number of written files.
+    """
+    logs = models.DiscoveryLog.objects.filter(success=True)
+    if addresses is not None:
+        logs = logs.filter(discoverable__address__in=addresses)
+    logs = logs.latest_by_command().select_related('discoverable', 'raw_output_blob')
+
+    count = 0
+    for log in logs.iterator():
+        name = log.request if log.command == log.request else f'{log.request}|{log.command}'
+        filename = os.path.join(path, get_filename(log.discoverable.address, name))
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(log.raw_output)
+        count += 1
+    return count
@@ -0,0 +1,58 @@
+"""
+Raw output compression.
+
+Command outputs are stored once per content (RawOutput, keyed by digest) and
+compressed with RAW_OUTPUT_COMPRESSION: zlib (default) or zstd (faster and
+smaller, requires zstandard on all NetBox and RQ hosts: pip install
+zstandard). The codec is detected from the data when decompressing, so the
+setting can be changed at any time.
+"""
+import hashlib
+import zlib
+from . import PLUGIN_SETTINGS
+
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd' #: Zstandard frame header
+
+
+def get_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd compression requires zstandard, install it with: pip install zstandard')
+    return zstandard
+
+
+def digest(text):
+    """
+    Return the content hash of a text.
+    """
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def compress(text, codec=None):
+    """
+    Return text compressed with codec (default: RAW_OUTPUT_COMPRESSION).
+    """
+    if not text:
+        return b''
+    if not codec:
+        codec = PLUGIN_SETTINGS.get('RAW_OUTPUT_COMPRESSION')
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        return get_zstandard().ZstdCompressor(level=PLUGIN_SETTINGS.get('RAW_OUTPUT_COMPRESSION_LEVEL')).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, PLUGIN_SETTINGS.get('RAW_OUTPUT_COMPRESSION_LEVEL'))
+    raise ValueError(f'Unknown compression {codec}')
+
+
+def decompress(data):
+    """
+    Return the text of compressed data.
+    """
+    if not data:
+        return ''
+    data = bytes(data) # PostgreSQL returns memoryview
+    if data.startswith(ZSTD_MAGIC):
+        return get_zstandard().ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
@@ -0,0 +1,264 @@
+"""
+Discovery coordinator.
+
+Split the addresses to be discovered in shards and enqueue one discovery job
+per shard, so discovery scales with the number of RQ workers. Shards are
+tracked as one logical discovery run (DiscoveryRun, see runs), which can be
+canceled and resumed. Addresses already being discovered by an active run
+with the same profile and queue join that run instead of being discovered
+twice (see runs.coalesce). Hosts being collected by another run when a shard
+starts are deferred to a job running after that run (see defer).
+
+Runs are enqueued on a priority queue: interactive requests on
+INTERACTIVE_QUEUE, scheduled sweeps on SCHEDULED_QUEUE, other requests (e.g.
+bulk discoveries from the list) on the default queue. Non interactive runs
+use small shards (SCHEDULED_SHARD_SIZE), so a worker picks interactive jobs
+within the duration of a small shard. Workers must listen on the queues by priority:
+
+    manage.py rqworker high default low
+
+Usage:
+
+    from netdoc import coordinator
+
+    run_id = coordinator.enqueue(addresses)
+    coordinator.status(run_id)
+    coordinator.cancel(run_id)
+    coordinator.resume(run_id)
+"""
+import time
+from collections import Counter
+import django_rq
+from django.db import transaction
+from rq.job import Dependency, Job
+from . import PLUGIN_SETTINGS
+from . import models
+from . import pipeline
+from . import runs
+from . import tasks
+from .models import DiscoveryRunStatusChoices, DiscoveryRunHostStatusChoices
+
+
+RUN_TTL = 86400 # Seconds shard jobs results are kept
+
+PENDING_JOB_STATUSES = ["queued", "deferred", "scheduled"]
+
+DEFER_INTERVAL = 1 #: Seconds before deferring hosts leased by runs without pending jobs
+
+
+class RunInProgress(Exception):
+    pass
+
+
+def chunks(items, size):
+    """
+    Split a list in chunks of size items.
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def shard(addresses, shard_by=None, shard_size=None):
+    """
+    Split addresses in shards. If shard_by is "site", each shard contains
+    addresses from one site only. Shards contain up to shard_size addresses.
+    """
+    if shard_by is None:
+        shard_by = PLUGIN_SETTINGS.get('SHARD_BY')
+    if not shard_size:
+        shard_size = PLUGIN_SETTINGS.get('SHARD_SIZE')
+    addresses = list(dict.fromkeys(addresses)) # Remove duplicates preserving order
+
+    if shard_by == "site":
+        sites = {}
+        discoverables = models.Discoverable.objects.filter(address__in=addresses).values_list('address', 'site_id')
+        for address, site_id in discoverables:
+            sites.setdefault(site_id, [])
+            if address not in sites[site_id]:
+                sites[site_id].append(address)
+        shards = []
+        for site_addresses in sites.values():
+            shards.extend(chunks(site_addresses, shard_size))
+        return shards
+
+    return chunks(addresses, shard_size)
+
+
+def enqueue(addresses, shard_by=None, shard_size=None, queue_name="default", profile=None):
+    """
+    Create a DiscoveryRun, enqueue one discovery job per shard on queue_name
+    and return the run ID. If all addresses joined in-flight runs, the new run
+    is discarded and the ID of the first joined run is returned.
+    """
+    with transaction.atomic():
+        # Requests for the same hosts are serialized (see runs.create)
+        run = runs.create(addresses, profile=profile, queue=queue_name)
+        joined = runs.coalesce(run)
+        if joined:
+            addresses = list(run.hosts.values_list('discoverable__address', flat=True))
+            if not addresses:
+                run.delete()
+                return joined[0]
+    # Jobs are enqueued once the hosts are committed
+    enqueue_run(run, addresses, shard_by=shard_by, shard_size=shard_size)
+    return run.pk
+
+
+def enqueue_interactive(addresses, profile=None):
+    """
+    Enqueue a discovery requested by a user on the high priority queue.
+    """
+    return enqueue(addresses, queue_name=PLUGIN_SETTINGS.get('INTERACTIVE_QUEUE'), profile=profile)
+
+
+def enqueue_scheduled(addresses, profile=None):
+    """
+    Enqueue a scheduled discovery on the low priority queue, in small shards.
+    """
+    return enqueue(addresses, queue_name=PLUGIN_SETTINGS.get('SCHEDULED_QUEUE'), profile=profile)
+
+
+def get_shard_size(queue_name):
+    """
+    Return the shard size of a queue: SHARD_SIZE for interactive requests,
+    SCHEDULED_SHARD_SIZE for the others (bulk and scheduled), so workers
+    pick interactive jobs within the duration of a small shard.
+    """
+    if queue_name == PLUGIN_SETTINGS.get('INTERACTIVE_QUEUE'):
+        return PLUGIN_SETTINGS.get('SHARD_SIZE')
+    return PLUGIN_SETTINGS.get('SCHEDULED_SHARD_SIZE')
+
+
+def enqueue_run(run, addresses, shard_by=None, shard_size=None, depends_on=None, lease_deadline=None):
+    """
+    Enqueue one discovery job per shard of a run, on the queue of the run,
+    after the depends_on jobs (see defer). Shard size defaults to the size
+    of the queue (see get_shard_size).
+    """
+    if not shard_size:
+        shard_size = get_shard_size(run.queue)
+    queue = django_rq.get_queue(run.queue)
+    job_ids = []
+    for addresses_shard in shard(addresses, shard_by=shard_by, shard_size=shard_size):
+        job = queue.enqueue(
+            tasks.discovery,
+            addresses_shard,
+            profile=run.profile or None,
+            run_id=run.pk,
+            lease_deadline=lease_deadline,
+            depends_on=Dependency(jobs=depends_on, allow_failure=True) if depends_on else None,
+            result_ttl=RUN_TTL,
+            meta={"netdoc_run": run.pk},
+        )
+        job_ids.append(job.id)
+    run.job_ids = run.job_ids + job_ids
+    models.DiscoveryRun.objects.filter(pk=run.pk).update(job_ids=run.job_ids)
+
+
+def defer(run_id, held, lease_deadline=None):
+    """
+    Enqueue the discovery of hosts leased by other runs ({address: holder
+    run}) in a new job of the run, depending on the holder jobs collecting
+    or ingesting them, so the worker is not blocked waiting for the leases.
+    Hosts still leased LEASE_WAIT seconds after the first deferral are not
+    deferred again. Return the deferred addresses.
+    """
+    if lease_deadline is None:
+        lease_deadline = time.time() + PLUGIN_SETTINGS.get('LEASE_WAIT')
+    if not held or time.time() >= lease_deadline or runs.is_canceled(run_id):
+        return []
+    run = models.DiscoveryRun.objects.get(pk=run_id)
+    discoverable_ids = dict(models.Discoverable.objects.filter(address__in=held).values_list('address', 'pk'))
+    depends_on = {}
+    for holder in set(holder for holder in held.values() if holder):
+        addresses = [address for address, address_holder in held.items() if address_holder == holder]
+        jobs = [job for job in get_jobs(holder) if job and set(job.args[0]) & set(addresses)]
+        ingest_job_ids = [pipeline.get_ingest_job_id(holder.pk, discoverable_ids.get(address)) for address in addresses]
+        ingest_job_ids = [job_id for job_id in ingest_job_ids if job_id]
+        if ingest_job_ids:
+            jobs.extend(Job.fetch_many(ingest_job_ids, connection=django_rq.get_connection(PLUGIN_SETTINGS.get('INGEST_QUEUE'))))
+        for job in jobs:
+            if get_job_status(job) in PENDING_JOB_STATUSES + ["started"]:
+                depends_on[job.id] = job
+    if not depends_on:
+        # Leases about to be released (or taken meanwhile): retry shortly
+        time.sleep(DEFER_INTERVAL)
+    addresses = list(held)
+    enqueue_run(run, addresses, depends_on=list(depends_on.values()), lease_deadline=lease_deadline)
+    return addresses
+
+
+def get_jobs(run):
+    """
+    Return the shard jobs of a run (None if expired).
+    """
+    connection = django_rq.get_connection(run.queue)
+    return Job.fetch_many(run.job_ids, connection=connection)
+
+
+def get_job_status(job):
+    if not job:
+        return "expired"
+    job_status = job.get_status()
+    return getattr(job_status, "value", job_status) # JobStatus is an Enum in recent RQ
+
+
+def status(run_id):
+    """
+    Return the status of a run (see DiscoveryRunStatusChoices), with shards
+    and hosts by status.
+    """
+    try:
+        run = models.DiscoveryRun.objects.get(pk=run_id)
+    except models.DiscoveryRun.DoesNotExist:
+        return {"run": run_id, "status": "unknown"}
+
+    shards = Counter(get_job_status(job) for job in get_jobs(run))
+    hosts = Counter(run.hosts.values_list('status', flat=True))
+    return {
+        "run": run.pk,
+        "status": run.status,
+        "queue": run.queue,
+        "shards": len(run.job_ids),
+        "shards_by_status": dict(shards),
+        "hosts": sum(hosts.values()),
+        "hosts_by_status": dict(hosts),
+    }
+
+
+def cancel(run_id):
+    """
+    Cancel a run: queued shards are canceled, running shards complete
+    in-flight hosts and skip the others.
+    """
+    run = models.DiscoveryRun.objects.get(pk=run_id)
+    if run.status in [DiscoveryRunStatusChoices.STATUS_COMPLETED, DiscoveryRunStatusChoices.STATUS_CANCELED]:
+        return
+    models.DiscoveryRun.objects.filter(pk=run.pk).update(status=DiscoveryRunStatusChoices.STATUS_CANCELING)
+
+    for job in get_jobs(run):
+        if get_job_status(job) in PENDING_JOB_STATUSES:
+            job.cancel()
+            # Job args: addresses of the shard
+            runs.finish(run.pk, job.args[0])
+    runs.update_status(run.pk)
+
+
+def resume(run_id):
+    """
+    Discover again hosts not completed, skipping commands already collected in
+    the run. Raise RunInProgress if shards are still queued or running.
+    """
+    run = models.DiscoveryRun.objects.get(pk=run_id)
+    for job in get_jobs(run):
+        if get_job_status(job) in PENDING_JOB_STATUSES + ["started"]:
+            raise RunInProgress(f'{run} has shards queued or running')
+    if run.hosts.filter(status=DiscoveryRunHostStatusChoices.STATUS_INGESTING).exists():
+        raise RunInProgress(f'{run} has hosts being ingested')
+
+    hosts = run.hosts.exclude(status=DiscoveryRunHostStatusChoices.STATUS_COMPLETED)
+    addresses = list(hosts.values_list('discoverable__address', flat=True))
+    if not addresses:
+        return
+    hosts.update(status=DiscoveryRunHostStatusChoices.STATUS_PENDING)
+    models.DiscoveryRun.objects.filter(pk=run.pk).update(status=DiscoveryRunStatusChoices.STATUS_QUEUED)
+    enqueue_run(run, addresses)
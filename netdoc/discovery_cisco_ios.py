@@ -1,172 +1,134 @@
 import json
 from ctypes import addressof
-from django.utils import timezone
-from nornir_netmiko.tasks import netmiko_send_command
 from nornir_utils.plugins.functions import print_result
-from nornir.core.filter import F
-from . import models
 from . import functions
+from . import registry
+from . import runs
+from .registry import Command
+from .nornir_processors import PipelineProcessor
+from .nornir_tasks import send_command
+
+
+MODE = "netmiko"
+PLATFORM = "cisco_ios"
+ENABLE = True
+DEFAULT_VRFS = ["default"] # Adding default VRF
+
+# Commands executed on each device (see registry). CMD line is passed also as
+# name, so we can log cmdline, stdout (result) and parsed output.
+COMMANDS = [
+    Command("show running-config", "show running-config", registry.CONFIG, registry.EXPENSIVE),
+    Command("show version", "show version", registry.INVENTORY, registry.CHEAP),
+    Command("show logging", "show logging", registry.LOGGING, registry.EXPENSIVE),
+    Command("show interfaces", "show interfaces", registry.INTERFACES, registry.EXPENSIVE),
+    Command("show cdp neighbors detail", "show cdp neighbors detail", registry.NEIGHBORS, registry.CHEAP),
+    Command("show lldp neighbors detail", "show lldp neighbors detail", registry.NEIGHBORS, registry.CHEAP),
+    Command("show vlan", "show vlan", registry.INVENTORY, registry.CHEAP),
+    Command("show mac address-table", "show mac address-table dynamic", registry.MAC, registry.EXPENSIVE),
+    Command("show vrf", "show vrf", registry.VRF, registry.CHEAP, cmd_verify=False), # See https://github.com/ktbyers/netmiko/issues/2707
+    Command("show ip interface", "show ip interface", registry.INTERFACES, registry.EXPENSIVE),
+    Command("show etherchannel summary", "show etherchannel summary", registry.INTERFACES, registry.CHEAP),
+    Command("show interfaces switchport", "show interfaces switchport", registry.INTERFACES, registry.CHEAP),
+    Command("show spanning-tree", "show spanning-tree", registry.PROTOCOLS, registry.EXPENSIVE),
+    Command("show interfaces trunk", "show interfaces trunk", registry.INTERFACES, registry.CHEAP), # only on switches; on routers info is in show interfaces
+    Command("show standby", "show standby", registry.PROTOCOLS, registry.CHEAP),
+    Command("show vrrp", "show vrrp", registry.PROTOCOLS, registry.CHEAP),
+    Command("show glbp", "show glbp", registry.PROTOCOLS, registry.CHEAP),
+    Command("show ip ospf neighbor", "show ip ospf neighbor", registry.PROTOCOLS, registry.CHEAP),
+    Command("show ip eigrp neighbors", "show ip eigrp neighbors", registry.PROTOCOLS, registry.CHEAP),
+    Command("show ip bgp neighbors", "show ip bgp neighbors", registry.PROTOCOLS, registry.CHEAP),
+]
+
+# Last configuration change, used to skip unchanged devices (see registry).
+# EXPENSIVE: the device builds the running configuration before filtering it
+FINGERPRINT = Command("fingerprint|show running-config | include Last configuration change", "show running-config | include Last configuration change", registry.FINGERPRINT, registry.EXPENSIVE)
+
+
+def vrf_commands(vrfs):
+    """
+    Return per VRF commands, executed after COMMANDS.
+    """
+    commands = []
+    for vrf in vrfs:
+        if vrf == "default":
+            # Default VRF has no name
+            commands.append(Command("show ip arp", "show ip arp", registry.ARP, registry.CHEAP))
+            commands.append(Command("show ip route", "show ip route", registry.ROUTE, registry.EXPENSIVE))
+        else:
+            commands.append(Command(f'show ip arp|show ip arp vrf {vrf}', f'show ip arp vrf {vrf}', registry.ARP, registry.CHEAP))
+            commands.append(Command(f'show ip route|show ip route vrf {vrf}', f'show ip route vrf {vrf}', registry.ROUTE, registry.EXPENSIVE))
+    return commands
+
+
+def vrfs_from_output(output):
+    """
+    Return the VRF list from the show vrf output.
+    """
+    vrfs = list(DEFAULT_VRFS)
+    try:
+        vrf_parsed_output = functions.parse_netmiko_output(output, platform=PLATFORM, command="show vrf")
+    except:
+        vrf_parsed_output = []
+    for entry in vrf_parsed_output:
+        vrfs.append(entry["name"])
+    return vrfs
 
 
-def discovery(nr):
+def discovery(nr, pipeline=None):
     """
     Discovery Cisco IOS devices
     """
-    mode = "netmiko"
-    platform = "cisco_ios"
-    filtered_devices = nr.filter(platform=platform)
-    enable=True
-    logs = []
+    filtered_devices = nr.filter(platform=PLATFORM)
 
     # Define tasks
     def multiple_tasks(task):
         """
-        Define tasks for the playbook. CMD line is passed also as name, so we
-        can log cmdline, stdout (result) and parsed output.
+        Define tasks for the playbook.
         """
-        task.run(
-            task=netmiko_send_command,
-            name="show running-config",
-            command_string="show running-config",
-            use_textfsm=False,
-            enable=enable,
-        )
-        task.run(task=netmiko_send_command, name="show version", command_string="show version", use_textfsm=False, enable=enable)
-        task.run(task=netmiko_send_command, name="show logging", command_string="show logging", use_textfsm=False, enable=enable)
-        task.run(
-            task=netmiko_send_command, name="show interfaces", command_string="show interfaces", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command,
-            name="show cdp neighbors detail",
-            command_string="show cdp neighbors detail",
-            use_textfsm=False,
-            enable=enable,
-        )
-        task.run(
-            task=netmiko_send_command,
-            name="show lldp neighbors detail",
-            command_string="show lldp neighbors detail",
-            use_textfsm=False,
-            enable=enable,
-        )
-        task.run(task=netmiko_send_command, name="show vlan", command_string="show vlan", use_textfsm=False, enable=enable)
-        task.run(
-            task=netmiko_send_command,
-            name="show mac address-table",
-            command_string="show mac address-table dynamic",
-            use_textfsm=False,
-            enable=enable,
-        )
-        task.run(task=netmiko_send_command, name="show vrf", command_string="show vrf", use_textfsm=False, cmd_verify=False, enable=enable) # See https://github.com/ktbyers/netmiko/issues/2707
-        task.run(
-            task=netmiko_send_command, name="show ip interface", command_string="show ip interface", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show etherchannel summary", command_string="show etherchannel summary", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show interfaces switchport", command_string="show interfaces switchport", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show spanning-tree", command_string="show spanning-tree", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show interfaces trunk", command_string="show interfaces trunk", use_textfsm=False, enable=enable
-        ) # only on switches; on routers info is in show interfaces
-        task.run(
-            task=netmiko_send_command, name="show standby", command_string="show standby", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show vrrp", command_string="show vrrp", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show glbp", command_string="show glbp", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show ip ospf neighbor", command_string="show ip ospf neighbor", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show ip eigrp neighbors", command_string="show ip eigrp neighbors", use_textfsm=False, enable=enable
-        )
-        task.run(
-            task=netmiko_send_command, name="show ip bgp neighbors", command_string="show ip bgp neighbors", use_textfsm=False, enable=enable
-        )
-
-    # Run the playbook
-    aggregated_results = filtered_devices.run(task=multiple_tasks)
+        if runs.is_canceled(task.host.data["run_id"]):
+            # Run canceled, in-flight hosts are completed
+            return
+        profile = task.host.data["profile"]
+        skip_classes = set()
+        if registry.use_fingerprint(PLATFORM, profile=profile):
+            multi_result = task.run(task=send_command, use_textfsm=False, enable=ENABLE, **FINGERPRINT.task_kwargs())
+
+            # Skip configuration derived commands if the device is unchanged
+            skip_classes = registry.get_skipped_classes(
+                functions.fingerprint(multi_result.result), task.host.data["fingerprint"], task.host.data["last_discovered_by_class"],
+            )
+            task.host.data["skip_classes"] = skip_classes
+
+        for command in registry.select(COMMANDS, profile=profile, skip_classes=skip_classes, exclude=task.host.data["exclude"]):
+            multi_result = task.run(task=send_command, use_textfsm=False, enable=ENABLE, **command.task_kwargs())
+
+            # Save VRF list for later
+            if command.request == "show vrf":
+                task.host.data["vrfs"] = vrfs_from_output(multi_result.result)
+
+    # Additional commands, executed after multiple_tasks
+    def additional_tasks(task):
+        """
+        Define additional tasks for the playbook.
+        """
+        if runs.is_canceled(task.host.data["run_id"]):
+            return
+
+        # Per VRF commands
+        vrf_commands_list = vrf_commands(task.host.data.get("vrfs", DEFAULT_VRFS))
+        skip_classes = task.host.data.get("skip_classes", set())
+        for command in registry.select(vrf_commands_list, profile=task.host.data["profile"], skip_classes=skip_classes, exclude=task.host.data["exclude"]):
+            # Per VRF commands do not require enable
+            task.run(task=send_command, use_textfsm=False, **command.task_kwargs())
+
+    # Run the playbook, results are ingested as soon as each host completes
+    aggregated_results = filtered_devices.with_processors([PipelineProcessor(pipeline, final=False)]).run(task=multiple_tasks)
 
     # Print the result
     print_result(aggregated_results)
 
-    for key, multi_result in aggregated_results.items():
-        vrfs = ["default"] # Adding default VRF
-        current_nr = nr.filter(F(name=key))
-
-        # MultiResult is an array of Result
-        for result in multi_result:
-            if result.name == "multiple_tasks":
-                # Skip MultipleTask
-                continue
-
-            address = result.host.dict()["hostname"]
-            discoverable = models.Discoverable.objects.get(address=address, mode=f'{mode}_{platform}')
-            discoverable.last_discovered_at = timezone.now() # Update last_discovered_at
-            discoverable.save()
-
-            # Log locally
-            log = functions.log_create(
-                discoverable=discoverable,
-                raw_output=result.result,
-                request=result.name,
-            )
-
-            # Save log for later
-            logs.append(log)
+    # Run the additional playbook on all hosts at once (failed hosts are skipped)
+    additional_aggregated_results = filtered_devices.with_processors([PipelineProcessor(pipeline)]).run(task=additional_tasks)
 
-            # Save VRF list for later
-            if result.name == "show vrf":
-                try:
-                    vrf_parsed_output = functions.parse_netmiko_output(result.result, platform=platform, command=result.name)
-                except:
-                    vrf_parsed_output = []
-                for entry in vrf_parsed_output:
-                    vrfs.append(entry["name"])
-
-        # Additional commands out of the multi result loop
-        def additional_tasks(task):
-            """
-            Define additional tasks for the playbook.
-            """
-            # Per VRF commands
-            for vrf in vrfs:
-                if vrf == "default":
-                    # Default VRF has no name
-                    task.run(task=netmiko_send_command, name="show ip arp", command_string="show ip arp", use_textfsm=False)
-                    task.run(task=netmiko_send_command, name="show ip route", command_string="show ip route", use_textfsm=False)
-                else:
-                    task.run(task=netmiko_send_command, name=f'show ip arp|show ip arp vrf {vrf}', command_string=f'show ip arp vrf {vrf}', use_textfsm=False)
-                    task.run(task=netmiko_send_command, name=f'show ip route|show ip route vrf {vrf}', command_string=f'show ip route vrf {vrf}', use_textfsm=False)
-
-        # Run the additional playbook
-        additional_aggregated_results = current_nr.run(task=additional_tasks)
-
-        # Print the result
-        print_result(additional_aggregated_results)
-
-        for key, additional_multi_result in additional_aggregated_results.items():
-            # MultiResult is an array of Result
-            for result in additional_multi_result:
-                if result.name == "additional_tasks":
-                    # Skip MultipleTask
-                    continue
-
-                # Log locally
-                log = functions.log_create(
-                    discoverable=discoverable,
-                    raw_output=result.result,
-                    request=result.name,
-                )
-
-                # Save log for later
-                logs.append(log)
+    # Print the result
+    print_result(additional_aggregated_results)
@@ -1,5 +1,6 @@
+import django_filters
 from netbox.filtersets import NetBoxModelFilterSet
-from .models import Discoverable, Credential, DiscoveryLog, ArpTableEntry, MacAddressTableEntry, RouteTableEntry
+from .models import Discoverable, Credential, DiscoveryLog, DiscoveryRun, ArpTableEntry, MacAddressTableEntry, RouteTableEntry
 from django.db.models import Q
 
 
@@ -48,12 +49,37 @@ class DiscoverableFilterSet(NetBoxModelFilterSet):
         )
 
 
+class DiscoveryRunFilterSet(NetBoxModelFilterSet):
+    class Meta:
+        model = DiscoveryRun
+        fields = ('status', 'profile')
+
+    def search(self, queryset, name, value):
+        return queryset.filter(
+            Q(status__icontains=value) |
+            Q(profile__icontains=value)
+        )
+
+
 class DiscoveryLogFilterSet(NetBoxModelFilterSet):
+    discoverable_id = django_filters.ModelMultipleChoiceFilter(
+        queryset=Discoverable.objects.all(),
+    )
+    latest = django_filters.BooleanFilter(
+        method='filter_latest',
+        label='Latest successful log of each command',
+    )
+
     class Meta:
         model = DiscoveryLog
         fields = ('configuration', 'success', 'parsed', 'ingested')
         # fields = ('command', 'request', 'discoverable')
 
+    def filter_latest(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.latest_by_command()
+
     def search(self, queryset, name, value):
         return queryset.filter(
             Q(discoverable__address__icontains=value) |
@@ -6,6 +6,7 @@ from netbox.forms import NetBoxModelForm, NetBoxModelFilterSetForm, NetBoxModelC
 from utilities.forms import CSVModelChoiceField, DynamicModelChoiceField, StaticSelect, BOOLEAN_WITH_BLANK_CHOICES, add_blank_choice
 from utilities.forms.fields import DynamicModelChoiceField
 from .models import Credential, Discoverable, DiscoveryLog, DiscoveryModeChoices, DiscoveryModeChoices
+from .registry import profile_choices
 from dcim.models import Site
 
 
@@ -79,6 +80,11 @@ class DiscoverableForm(NetBoxModelForm):
         required=False,
         initial=True,
     )
+    profile = forms.ChoiceField(
+        choices=profile_choices,
+        required=False,
+        help_text='Command profile (site or default profile if empty)',
+    )
     site = DynamicModelChoiceField(
         queryset=Site.objects.all(),
         help_text='Site',
@@ -88,7 +94,7 @@ class DiscoverableForm(NetBoxModelForm):
     class Meta:
         model = Discoverable
         fields = (
-            'address', 'device', 'credential', 'mode', 'discoverable', 'site', 'tags',
+            'address', 'device', 'credential', 'mode', 'discoverable', 'profile', 'site', 'tags',
         )
 
 
@@ -107,6 +113,11 @@ class DiscoverableCSVForm(NetBoxModelCSVForm):
         required=True,
         help_text='Discovery mode',
     )
+    profile = forms.ChoiceField(
+        choices=profile_choices,
+        required=False,
+        help_text='Command profile',
+    )
     site = CSVModelChoiceField(
         queryset=Site.objects.all(),
         to_field_name='name',
@@ -116,7 +127,7 @@ class DiscoverableCSVForm(NetBoxModelCSVForm):
 
     class Meta:
         model = Discoverable
-        fields = ('address', 'credential', 'mode', 'site')
+        fields = ('address', 'credential', 'mode', 'profile', 'site')
 
 
 class DiscoverableBulkEditForm(NetBoxModelBulkEditForm):
@@ -137,6 +148,12 @@ class DiscoverableBulkEditForm(NetBoxModelBulkEditForm):
         help_text='Is discoverable?',
         required=False,
     )
+    profile = forms.ChoiceField(
+        choices=profile_choices,
+        required=False,
+        widget=StaticSelect(),
+        help_text='Command profile',
+    )
     site = forms.ModelChoiceField(
         queryset=Site.objects.all(),
         to_field_name='name',
@@ -145,7 +162,7 @@ class DiscoverableBulkEditForm(NetBoxModelBulkEditForm):
     )
 
     model = Discoverable
-    nullable_fields = ('device')
+    nullable_fields = ('device', 'profile')
 
 
 class DiscoveryLogListFilterForm(NetBoxModelFilterSetForm):
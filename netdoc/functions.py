@@ -1,8 +1,15 @@
 import re
 import os
+import hashlib
 import importlib
+from django.db import transaction
+from django.db.models import F
 from netmiko.utilities import get_structured_data
-from netdoc.models import DiscoveryLog
+from netdoc import PLUGIN_SETTINGS
+from netdoc import compression
+from netdoc import registry
+from netdoc import textfsm_cache
+from netdoc.models import DiscoveryLog, RawOutput
 from netdoc.ingestors.functions import log_ingest
 
 
@@ -41,37 +48,126 @@ def is_config(cmd):
     return False
 
 
-def log_create(discoverable=None, raw_output=None, request=None, **kwargs):
+def log_build(discoverable=None, raw_output=None, request=None, **kwargs):
     """
-    Create a log.
+    Return a new log (not saved, see log_bulk_create).
     """
-    log = None
-
     kwargs['success'] = valid_output(raw_output)
-    kwargs['configuration'] = is_config(request)
 
     # Extract command from request if they differ (e.g. 'show ip arp|show ip arp vrf x')
-    kwargs['command'] = request.split('|').pop()
-    request = request.split('|').pop(0)
+    # Command can contain | (e.g. 'fingerprint|show running-config | include x')
+    kwargs['command'] = request.split('|', 1).pop()
+    request = request.split('|', 1).pop(0)
+    kwargs['configuration'] = is_config(request)
 
-    log = DiscoveryLog.objects.create(discoverable=discoverable, raw_output=raw_output, request=request, **kwargs)
+    return DiscoveryLog(discoverable=discoverable, raw_output=raw_output, request=request, **kwargs)
 
-    # Try to parse
-    try:
-        log = log_parse(log)
-    except:
-        pass
 
-    # Try to ingest
-    try:
-        log = log_ingest(log)
-    except:
-        pass
+def log_create(discoverable=None, raw_output=None, request=None, **kwargs):
+    """
+    Create a log.
+    """
+    log = log_build(discoverable=discoverable, raw_output=raw_output, request=request, **kwargs)
+    log = log_bulk_create([log]).pop()
+
+    if not log.ingested:
+        # Try to ingest
+        try:
+            log = log_ingest(log)
+        except:
+            pass
 
     return log
 
 
-def log_parse(log):
+def log_bulk_create(logs, parse=True):
+    """
+    Save new logs (see log_build) with one query, outputs are stored once
+    (see RawOutput). If SKIP_UNCHANGED is set, logs with the same output as
+    the latest ingested log of the same command copy its parsed output and
+    are not parsed again; they are not ingested again either, except for
+    volatile commands (ARP, MAC address and routing tables must be refreshed).
+    Other logs are parsed in memory if parse is set.
+    """
+    latest_logs = {}
+    if PLUGIN_SETTINGS.get('SKIP_UNCHANGED'):
+        for discoverable_id in set(log.discoverable_id for log in logs):
+            commands = [log.command for log in logs if log.discoverable_id == discoverable_id]
+            previous_logs = DiscoveryLog.objects.filter(
+                discoverable_id=discoverable_id, command__in=commands
+            ).latest_by_command().annotate(raw_output_digest=F('raw_output_blob__digest'))
+            for previous_log in previous_logs:
+                latest_logs[(discoverable_id, previous_log.request, previous_log.command)] = previous_log
+
+    for log in logs:
+        latest_log = latest_logs.get((log.discoverable_id, log.request, log.command))
+        if latest_log and latest_log.ingested and latest_log.raw_output_digest == compression.digest(log.raw_output):
+            # Unchanged output
+            log.parsed = latest_log.parsed
+            log.parsed_output = latest_log.parsed_output
+            platform = '_'.join(log.discoverable.mode.split('_')[1:])
+            command = registry.get_command(platform, log.request)
+            log.ingested = not command or command.command_class not in registry.VOLATILE
+        elif parse:
+            # Try to parse
+            try:
+                log_parse(log, save=False)
+            except:
+                pass
+
+    with transaction.atomic():
+        # RawOutputs are locked until the logs are saved (see RawOutputManager.for_texts)
+        blobs = RawOutput.objects.for_texts([log.raw_output for log in logs])
+        for log in logs:
+            log.raw_output_blob = blobs[compression.digest(log.raw_output)]
+        return DiscoveryLog.objects.bulk_create(logs)
+
+
+def log_bulk_process(logs, parse=True):
+    """
+    Parse (if parse is set) and ingest saved logs, in order. Parsing and
+    ingestion flags are saved with one query. Ingested logs (unchanged
+    outputs) are skipped.
+    """
+    fields = ['ingested']
+    if parse:
+        fields.extend(['parsed', 'parsed_output'])
+    pending_logs = [log for log in logs if not log.ingested]
+    changed = False
+    for log in pending_logs:
+        if parse and not log.parsed:
+            # Try to parse
+            try:
+                log_parse(log, save=False)
+            except:
+                pass
+
+        if changed:
+            # Previous ingestors can update the Discoverable (e.g. show version sets the Device)
+            log.discoverable.refresh_from_db()
+
+        # Try to ingest
+        try:
+            log_ingest(log, save=False)
+        except:
+            pass
+        changed = log.ingested
+
+    DiscoveryLog.objects.bulk_update(pending_logs, fields)
+    return logs
+
+
+def fingerprint(output):
+    """
+    Return the fingerprint (hash) of a valid output, None otherwise.
+    """
+    if not output or not valid_output(output):
+        return None
+    normalized_output = '\n'.join(line.strip() for line in output.strip().splitlines())
+    return hashlib.sha256(normalized_output.encode()).hexdigest()
+
+
+def log_parse(log, save=True):
     parsed = False
     parsed_output = None
     try:
@@ -87,13 +183,18 @@ def log_parse(log):
 
     log.parsed = parsed
     log.parsed_output = parsed_output
-    log.save()
+    if save:
+        log.save()
     return log
 
 
 def parse_netmiko_output(output, command=None, platform=None):
     try:
-        parsed_output = get_structured_data(output, platform=platform, command=command)
+        try:
+            # Compiled templates (see textfsm_cache)
+            parsed_output = textfsm_cache.parse(output, platform=platform, command=command)
+        except textfsm_cache.TemplateNotFound:
+            parsed_output = get_structured_data(output, platform=platform, command=command)
         if not isinstance(parsed_output, dict) and not isinstance(parsed_output, list):
             raise FailedToParse
     except Exception:
@@ -608,13 +608,19 @@ def delete_none(_dict):
     return _dict
 
 
-def log_ingest(log):
+def log_ingest(log, save=True):
+    """
+    Ingest a log. If save is False, the ingested flag is not saved (see
+    netdoc.functions.log_bulk_process).
+    """
     function_name = parsing_function_from_log(log)
     try:
         m = importlib.import_module(f'netdoc.ingestors.{function_name}')
     except:
         raise NoIngestor
     m.ingest(log, force=True)
+    if save:
+        log.save()
     return log
 
 
@@ -81,4 +81,3 @@ def ingest(log, force=False):
 
     # Update the log
     log.ingested = True
-    log.save()
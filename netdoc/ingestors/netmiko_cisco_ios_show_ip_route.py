@@ -49,6 +49,4 @@ def ingest(log, force=False):
         route_o = functions.set_get_route(**args)
 
     # Update the log
-    log.discoverable.save()
     log.ingested = True
-    log.save()
@@ -30,6 +30,4 @@ def ingest(log, force=False):
         vrf_o = functions.set_get_vrf(name=vrf_name, create_kwargs=create_kwargs, update_kwargs=update_kwargs)
 
     # Update the log
-    log.discoverable.save()
     log.ingested = True
-    log.save()
@@ -45,4 +45,3 @@ def ingest(log, force=False):
 
     # Update the log
     log.ingested = True
-    log.save()
@@ -33,6 +33,4 @@ def ingest(log, force=False):
         macadddressentry_o = functions.set_get_macaddressentry(interface=interface_o, vvid=vvid, mac_address=mac_address)
 
     # Update the log
-    log.discoverable.save()
     log.ingested = True
-    log.save()
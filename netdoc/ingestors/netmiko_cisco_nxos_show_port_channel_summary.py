@@ -41,4 +41,3 @@ def ingest(log, force=False):
        
     # Update the log
     log.ingested = True
-    log.save()
@@ -32,6 +32,4 @@ def ingest(log, force=False):
         vlan_o = functions.set_get_vlan(vid=vlan_id, name=vlan_name, site=site_o)
 
     # Update the log
-    log.discoverable.save()
     log.ingested = True
-    log.save()
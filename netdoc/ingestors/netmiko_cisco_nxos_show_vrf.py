@@ -26,6 +26,4 @@ def ingest(log, force=False):
         vrf_o = functions.set_get_vrf(name=vrf_name, create=True)
 
     # Update the log
-    log.discoverable.save()
     log.ingested = True
-    log.save()
@@ -34,6 +34,4 @@ def ingest(log, force=False):
 
 
     # Update the log
-    log.discoverable.save()
     log.ingested = True
-    log.save()
@@ -0,0 +1,141 @@
+"""
+Per Discoverable leases.
+
+A Discoverable is collected by one run at a time: the run holds a lease (a
+Redis key with the run ID, expiring after LEASE_TTL seconds) from the start of
+the shard collecting it until the host is completed. Another run collecting
+the same Discoverable does not wait in the worker: the host is deferred to a
+job depending on the holder (up to LEASE_WAIT seconds, then the host fails
+and can be resumed, see coordinator.defer). Hosts only queued in a run are
+not leased, so an interactive request is not blocked by a pending scheduled
+sweep.
+
+Leases are renewed by the collecting shard (see renewing), and taken over
+from inactive runs (e.g. a crashed worker) atomically.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+import django_rq
+from . import PLUGIN_SETTINGS
+from . import models
+from .models import DiscoveryRunStatusChoices
+
+
+LEASE_KEY = "netdoc:lease:{}"
+
+ACTIVE = [
+    DiscoveryRunStatusChoices.STATUS_QUEUED,
+    DiscoveryRunStatusChoices.STATUS_RUNNING,
+    DiscoveryRunStatusChoices.STATUS_CANCELING,
+]
+
+# Delete a lease only if held by the given run
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Set a lease only if free or still held by the given (inactive) run
+TAKEOVER_SCRIPT = """
+local holder = redis.call('get', KEYS[1])
+if holder == false or holder == ARGV[1] then
+    return redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+
+# Extend a lease only if held by the given run
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def get_connection():
+    return django_rq.get_connection("default")
+
+
+def acquire(run_id, discoverable_ids):
+    """
+    Acquire or refresh the leases of Discoverables for a run. Return the
+    Discoverables leased by other active runs as {discoverable_id: run} (run
+    is None if the lease was taken by another run meanwhile). Leases of
+    inactive runs (e.g. a crashed worker) are taken over.
+    """
+    connection = get_connection()
+    ttl = PLUGIN_SETTINGS.get('LEASE_TTL')
+    renew_script = connection.register_script(RENEW_SCRIPT)
+    takeover_script = connection.register_script(TAKEOVER_SCRIPT)
+    holders = {}
+    for discoverable_id in discoverable_ids:
+        key = LEASE_KEY.format(discoverable_id)
+        if connection.set(key, run_id, nx=True, ex=ttl):
+            continue
+        holder = connection.get(key)
+        if holder is not None and int(holder) == run_id:
+            renew_script(keys=[key], args=[run_id, ttl])
+            continue
+        holders[discoverable_id] = int(holder) if holder is not None else None
+
+    active_runs = models.DiscoveryRun.objects.in_bulk(set(holder for holder in holders.values() if holder is not None))
+    held = {}
+    for discoverable_id, holder in holders.items():
+        if holder in active_runs and active_runs[holder].status in ACTIVE:
+            held[discoverable_id] = active_runs[holder]
+        elif not takeover_script(keys=[LEASE_KEY.format(discoverable_id)], args=[holder or '', run_id, ttl]):
+            # Taken by another run meanwhile
+            held[discoverable_id] = None
+    return held
+
+
+def release(run_id, discoverable_ids):
+    """
+    Release the leases of Discoverables held by a run.
+    """
+    connection = get_connection()
+    script = connection.register_script(RELEASE_SCRIPT)
+    for discoverable_id in discoverable_ids:
+        script(keys=[LEASE_KEY.format(discoverable_id)], args=[run_id])
+
+
+def renew(run_id, discoverable_ids):
+    """
+    Extend the leases of Discoverables still held by a run to LEASE_TTL
+    seconds. Released leases are not acquired again.
+    """
+    connection = get_connection()
+    ttl = PLUGIN_SETTINGS.get('LEASE_TTL')
+    script = connection.register_script(RENEW_SCRIPT)
+    for discoverable_id in discoverable_ids:
+        script(keys=[LEASE_KEY.format(discoverable_id)], args=[run_id, ttl])
+
+
+@contextmanager
+def renewing(run_id, discoverable_ids, interval=None):
+    """
+    Renew the leases of Discoverables held by a run every interval seconds
+    (default: a third of LEASE_TTL) while the block runs.
+    """
+    if interval is None:
+        interval = PLUGIN_SETTINGS.get('LEASE_TTL') / 3
+    stop = threading.Event()
+
+    def renewer():
+        while not stop.wait(interval):
+            try:
+                renew(run_id, discoverable_ids)
+            except Exception as err:
+                logging.error(f'Failed to renew leases of run {run_id}: {err}')
+
+    thread = threading.Thread(target=renewer, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from netdoc import simulator
+
+
+class Command(BaseCommand):
+    help = 'Discover a simulated Cisco SSH fleet end to end and report timings (start netdoc_simulator first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=100, help='Number of simulated devices')
+        parser.add_argument('--offset', type=int, default=0, help='First device index')
+        parser.add_argument('--platform', action='append', dest='platforms', choices=list(simulator.PROMPTS), help='Device platform (can be repeated, default: all)')
+        parser.add_argument('--collector', help='Collector (default: COLLECTOR)')
+        parser.add_argument('--profile', help='Command profile (default: profile of each device)')
+
+    def handle(self, *args, **options):
+        stats = simulator.benchmark(
+            simulator.get_devices(options['devices'], platforms=options['platforms'], offset=options['offset']),
+            collector=options['collector'],
+            profile=options['profile'],
+        )
+        self.stdout.write(f'Discovered {stats["devices"]} devices in {stats["elapsed"]:.1f}s ({stats["devices_per_second"]:.1f} devices/s)')
+        self.stdout.write(f'Logs: {stats["logs"]}, success: {stats["success"]}, parsed: {stats["parsed"]}, ingested: {stats["ingested"]}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from netdoc import collector_replay
+
+
+class Command(BaseCommand):
+    help = 'Export the latest outputs of each device for the replay collector'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Destination directory')
+        parser.add_argument('--address', action='append', dest='addresses', help='Export a single address (can be repeated)')
+
+    def handle(self, *args, **options):
+        count = collector_replay.capture(options['path'], addresses=options['addresses'])
+        self.stdout.write(f'Exported {count} outputs to {options["path"]}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from netdoc import retention
+
+
+class Command(BaseCommand):
+    help = 'Delete expired discovery logs (see LOG_RETENTION_DAYS and LOG_RETENTION_LOGS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Delete logs older than days')
+        parser.add_argument('--keep', type=int, help='Keep the latest logs of each command and device')
+        parser.add_argument('--batch-size', type=int, help='Logs deleted per query')
+        parser.add_argument('--dry-run', action='store_true', help='Count logs to delete only')
+
+    def handle(self, *args, **options):
+        deleted_logs, deleted_raw_outputs = retention.prune(
+            days=options['days'],
+            keep=options['keep'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{deleted_logs} logs to delete')
+        else:
+            self.stdout.write(f'Deleted {deleted_logs} logs and {deleted_raw_outputs} raw outputs')
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from netdoc import collector_replay
+
+
+class Command(BaseCommand):
+    help = 'Discover devices from captured outputs (see collector_replay)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Captured outputs directory or archive')
+        parser.add_argument('--address', action='append', dest='addresses', help='Replay a single address (can be repeated)')
+        parser.add_argument('--profile', help='Command profile (default: profile of each device)')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        collector_replay.discovery(addresses=options['addresses'], path=options['path'], profile=options['profile'])
+        self.stdout.write(f'Replay completed in {time.monotonic() - start:.1f}s')
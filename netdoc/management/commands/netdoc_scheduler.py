@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from netdoc import PLUGIN_SETTINGS
+from netdoc import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run tiered discovery schedules (see SCHEDULES)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single tick and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            runs = scheduler.tick()
+            for profile, run_id in runs.items():
+                self.stdout.write(f'Started {profile} discovery (run {run_id})')
+            if options['once']:
+                break
+            time.sleep(PLUGIN_SETTINGS.get('SCHEDULE_TICK'))
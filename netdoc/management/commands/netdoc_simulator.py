@@ -0,0 +1,39 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from netdoc import simulator
+
+
+class Command(BaseCommand):
+    help = 'Start a simulated Cisco SSH fleet (see simulator)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=100, help='Number of simulated devices')
+        parser.add_argument('--offset', type=int, default=0, help='First device index (run multiple simulators with different offsets)')
+        parser.add_argument('--platform', action='append', dest='platforms', choices=list(simulator.PROMPTS), help='Device platform (can be repeated, default: all)')
+        parser.add_argument('--latency', type=float, default=0, help='Average seconds per command')
+        parser.add_argument('--login-latency', type=float, default=0, help='Average seconds per login')
+        parser.add_argument('--output-size', type=int, default=1024, help='Bytes of outputs without a fixture')
+        parser.add_argument('--auth-failure-rate', type=float, default=0, help='Rejected logins (0-1)')
+        parser.add_argument('--failure-rate', type=float, default=0, help='Commands returning an error (0-1)')
+        parser.add_argument('--drop-rate', type=float, default=0, help='Commands closing the session (0-1)')
+        parser.add_argument('--create', action='store_true', help='Create matching Discoverables')
+
+    def get_devices(self, options):
+        return simulator.get_devices(options['devices'], platforms=options['platforms'], offset=options['offset'])
+
+    def get_options(self, options):
+        return simulator.SimulatorOptions(
+            latency=options['latency'],
+            login_latency=options['login_latency'],
+            output_size=options['output_size'],
+            auth_failure_rate=options['auth_failure_rate'],
+            failure_rate=options['failure_rate'],
+            drop_rate=options['drop_rate'],
+        )
+
+    def handle(self, *args, **options):
+        devices = self.get_devices(options)
+        if options['create']:
+            simulator.create_discoverables(devices)
+        self.stdout.write(f'Simulating {len(devices)} devices from {devices[0].address}')
+        asyncio.run(simulator.serve(devices, options=self.get_options(options)))
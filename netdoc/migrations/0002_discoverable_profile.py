@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoverable',
+            name='profile',
+            field=models.CharField(blank=True, default='', max_length=30),
+        ),
+    ]
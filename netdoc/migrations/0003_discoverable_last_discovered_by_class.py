@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0002_discoverable_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoverable',
+            name='last_discovered_by_class',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0003_discoverable_last_discovered_by_class'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoverable',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
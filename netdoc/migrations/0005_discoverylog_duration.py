@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0004_discoverable_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoverylog',
+            name='duration',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import taggit.managers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('extras', '0073_journalentry_tags_custom_fields'),
+        ('netdoc', '0005_discoverylog_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscoveryRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True, null=True)),
+                ('custom_field_data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('status', models.CharField(default='queued', editable=False, max_length=30)),
+                ('profile', models.CharField(blank=True, default='', editable=False, max_length=30)),
+                ('job_ids', models.JSONField(default=list, editable=False)),
+                ('tags', taggit.managers.TaggableManager(through='extras.TaggedItem', to='extras.Tag')),
+            ],
+            options={
+                'verbose_name': 'Run',
+                'verbose_name_plural': 'Runs',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.CreateModel(
+            name='DiscoveryRunHost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True, null=True)),
+                ('last_updated', models.DateTimeField(auto_now=True, null=True)),
+                ('custom_field_data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('status', models.CharField(default='pending', editable=False, max_length=30)),
+                ('logs', models.PositiveIntegerField(default=0, editable=False)),
+                ('parsed', models.PositiveIntegerField(default=0, editable=False)),
+                ('ingested', models.PositiveIntegerField(default=0, editable=False)),
+                ('discoverable', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='netdoc.discoverable')),
+                ('run', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='hosts', to='netdoc.discoveryrun')),
+                ('tags', taggit.managers.TaggableManager(through='extras.TaggedItem', to='extras.Tag')),
+            ],
+            options={
+                'verbose_name': 'Run host',
+                'verbose_name_plural': 'Run hosts',
+                'ordering': ('run', 'discoverable'),
+                'unique_together': {('run', 'discoverable')},
+            },
+        ),
+        migrations.AddField(
+            model_name='discoverylog',
+            name='run',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='discoverylogs', to='netdoc.discoveryrun'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0006_discoveryrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryrun',
+            name='queue',
+            field=models.CharField(default='default', editable=False, max_length=30),
+        ),
+    ]
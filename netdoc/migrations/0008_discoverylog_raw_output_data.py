@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def compress_raw_output(apps, schema_editor):
+    from netdoc import compression
+
+    DiscoveryLog = apps.get_model('netdoc', 'DiscoveryLog')
+    logs = []
+    for log in DiscoveryLog.objects.only('pk', 'raw_output').iterator(chunk_size=BATCH_SIZE):
+        log.raw_output_data = compression.compress(log.raw_output)
+        logs.append(log)
+        if len(logs) >= BATCH_SIZE:
+            DiscoveryLog.objects.bulk_update(logs, ['raw_output_data'])
+            logs = []
+    DiscoveryLog.objects.bulk_update(logs, ['raw_output_data'])
+
+
+def decompress_raw_output(apps, schema_editor):
+    from netdoc import compression
+
+    DiscoveryLog = apps.get_model('netdoc', 'DiscoveryLog')
+    logs = []
+    for log in DiscoveryLog.objects.only('pk', 'raw_output_data').iterator(chunk_size=BATCH_SIZE):
+        log.raw_output = compression.decompress(log.raw_output_data)
+        logs.append(log)
+        if len(logs) >= BATCH_SIZE:
+            DiscoveryLog.objects.bulk_update(logs, ['raw_output'])
+            logs = []
+    DiscoveryLog.objects.bulk_update(logs, ['raw_output'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0007_discoveryrun_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoverylog',
+            name='raw_output_data',
+            field=models.BinaryField(blank=True, default=b'', editable=False),
+        ),
+        # Data is already compressed: skip PostgreSQL (TOAST) compression
+        migrations.RunSQL(
+            'ALTER TABLE netdoc_discoverylog ALTER COLUMN raw_output_data SET STORAGE EXTERNAL',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(compress_raw_output, decompress_raw_output),
+        migrations.RemoveField(
+            model_name='discoverylog',
+            name='raw_output',
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def deduplicate_raw_output(apps, schema_editor):
+    from netdoc import compression
+
+    DiscoveryLog = apps.get_model('netdoc', 'DiscoveryLog')
+    RawOutput = apps.get_model('netdoc', 'RawOutput')
+    blobs = {} # digest: RawOutput ID
+    logs = []
+    for log in DiscoveryLog.objects.only('pk', 'raw_output_data').iterator(chunk_size=BATCH_SIZE):
+        data = bytes(log.raw_output_data)
+        digest = compression.digest(compression.decompress(data))
+        if digest not in blobs:
+            # Already compressed
+            blobs[digest] = RawOutput.objects.create(digest=digest, data=data).pk
+        log.raw_output_blob_id = blobs[digest]
+        logs.append(log)
+        if len(logs) >= BATCH_SIZE:
+            DiscoveryLog.objects.bulk_update(logs, ['raw_output_blob'])
+            logs = []
+    DiscoveryLog.objects.bulk_update(logs, ['raw_output_blob'])
+
+
+def duplicate_raw_output(apps, schema_editor):
+    DiscoveryLog = apps.get_model('netdoc', 'DiscoveryLog')
+    logs = []
+    for log in DiscoveryLog.objects.select_related('raw_output_blob').only('pk', 'raw_output_blob__data').iterator(chunk_size=BATCH_SIZE):
+        log.raw_output_data = log.raw_output_blob.data if log.raw_output_blob else b''
+        logs.append(log)
+        if len(logs) >= BATCH_SIZE:
+            DiscoveryLog.objects.bulk_update(logs, ['raw_output_data'])
+            logs = []
+    DiscoveryLog.objects.bulk_update(logs, ['raw_output_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0008_discoverylog_raw_output_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawOutput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False)),
+                ('digest', models.CharField(editable=False, max_length=64, unique=True)),
+                ('data', models.BinaryField(blank=True, default=b'', editable=False)),
+            ],
+        ),
+        # Data is already compressed: skip PostgreSQL (TOAST) compression
+        migrations.RunSQL(
+            'ALTER TABLE netdoc_rawoutput ALTER COLUMN data SET STORAGE EXTERNAL',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='discoverylog',
+            name='raw_output_blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='netdoc.rawoutput'),
+        ),
+        migrations.RunPython(deduplicate_raw_output, duplicate_raw_output),
+        migrations.RemoveField(
+            model_name='discoverylog',
+            name='raw_output_data',
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('netdoc', '0009_rawoutput'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discoverylog',
+            index=models.Index(fields=['discoverable', 'request', 'command', '-created'], name='netdoc_log_latest'),
+        ),
+    ]
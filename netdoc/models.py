@@ -1,13 +1,17 @@
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import models, transaction
+from django.db.models.expressions import RawSQL
 from django.urls import reverse
 
 from netbox.models import NetBoxModel
 from ipam.fields import IPAddressField
 from dcim.fields import MACAddressField
 from utilities.choices import ChoiceSet
+from utilities.querysets import RestrictedQuerySet
 from django.core.exceptions import ValidationError
 
+from . import compression
+
 
 class DiscoveryModeChoices(ChoiceSet):
     key = 'Discoverable.mode'
@@ -134,6 +138,9 @@ class Discoverable(NetBoxModel):
     )
     discoverable = models.BooleanField(default=False) #: New created devices have discoverable=False by default (e.g. if created from CDP/LLDP)
     last_discovered_at = models.DateTimeField(blank=True, null=True, editable=False)
+    last_discovered_by_class = models.JSONField(default=dict, blank=True, editable=False) #: Command class: last discovery (ISO format)
+    fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False) #: Hash of the fingerprint output from the last discovery (see registry)
+    profile = models.CharField(max_length=30, blank=True, default='') #: Command profile (see registry), site or default profile if empty
     site = models.ForeignKey(
         to='dcim.Site',
         on_delete=models.CASCADE,
@@ -153,10 +160,182 @@ class Discoverable(NetBoxModel):
         return reverse('plugins:netdoc:discoverable', args=[self.pk])
 
 
+#
+# Discovery run models
+#
+
+class DiscoveryRunStatusChoices(ChoiceSet):
+    key = 'DiscoveryRun.status'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_CANCELING = 'canceling'
+    STATUS_CANCELED = 'canceled'
+    STATUS_COMPLETED = 'completed'
+
+    CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_CANCELING, 'Canceling'),
+        (STATUS_CANCELED, 'Canceled'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+
+
+class DiscoveryRunHostStatusChoices(ChoiceSet):
+    key = 'DiscoveryRunHost.status'
+
+    STATUS_PENDING = 'pending'
+    STATUS_COLLECTED = 'collected'
+    STATUS_INGESTING = 'ingesting'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELED = 'canceled'
+
+    CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COLLECTED, 'Collected'),
+        (STATUS_INGESTING, 'Ingesting'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELED, 'Canceled'),
+    ]
+
+
+class DiscoveryRun(NetBoxModel):
+    """
+    A discovery requested on a set of Discoverables, executed by one or more
+    RQ jobs (see coordinator). Progress is tracked per host
+    (DiscoveryRunHost).
+    """
+    status = models.CharField(
+        max_length=30,
+        choices=DiscoveryRunStatusChoices,
+        default=DiscoveryRunStatusChoices.STATUS_QUEUED,
+        editable=False,
+    )
+    profile = models.CharField(max_length=30, blank=True, default='', editable=False) #: Command profile for all hosts, profile of each Discoverable if empty
+    job_ids = models.JSONField(default=list, editable=False) #: RQ jobs, one per shard
+    queue = models.CharField(max_length=30, default='default', editable=False) #: RQ queue of the jobs
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Run'
+        verbose_name_plural = 'Runs'
+
+    def __str__(self):
+        return f'Run {self.pk}'
+
+    def get_absolute_url(self):
+        return reverse('plugins:netdoc:discoveryrun', args=[self.pk])
+
+
+class DiscoveryRunHost(NetBoxModel):
+    run = models.ForeignKey(
+        to=DiscoveryRun,
+        on_delete=models.CASCADE,
+        related_name='hosts',
+        editable=False,
+    )
+    discoverable = models.ForeignKey(
+        to=Discoverable,
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
+    status = models.CharField(
+        max_length=30,
+        choices=DiscoveryRunHostStatusChoices,
+        default=DiscoveryRunHostStatusChoices.STATUS_PENDING,
+        editable=False,
+    )
+    logs = models.PositiveIntegerField(default=0, editable=False) #: Collected outputs
+    parsed = models.PositiveIntegerField(default=0, editable=False) #: Parsed outputs
+    ingested = models.PositiveIntegerField(default=0, editable=False) #: Ingested outputs
+
+    class Meta:
+        ordering = ('run', 'discoverable')
+        unique_together = ('run', 'discoverable')
+        verbose_name = 'Run host'
+        verbose_name_plural = 'Run hosts'
+
+    def __str__(self):
+        return f'{self.discoverable} in {self.run}'
+
+    def get_absolute_url(self):
+        return self.run.get_absolute_url()
+
+
 #
 # Discovery log model
 #
 
+class RawOutputManager(models.Manager):
+    def for_texts(self, texts):
+        """
+        Return the RawOutputs of texts as {digest: RawOutput}, creating the
+        missing ones. Must run in the transaction saving the referencing
+        logs: RawOutputs are locked, so pruning cannot delete them before the
+        logs are saved (see retention). RawOutputs deleted by pruning before
+        being locked are created again.
+        """
+        texts = {compression.digest(text): text for text in texts}
+        blobs = {}
+        while len(blobs) < len(texts):
+            pending = [digest for digest in texts if digest not in blobs]
+            existing = set(self.filter(digest__in=pending).values_list('digest', flat=True))
+            missing = [
+                RawOutput(digest=digest, data=compression.compress(texts[digest]))
+                for digest in pending if digest not in existing
+            ]
+            if missing:
+                # Concurrent jobs can create the same RawOutput
+                self.bulk_create(missing, ignore_conflicts=True)
+            # Locked in digest order to avoid deadlocks between jobs
+            locked = self.filter(digest__in=pending).only('pk', 'digest').order_by('digest').select_for_update(no_key=True)
+            blobs.update((blob.digest, blob) for blob in locked)
+        return blobs
+
+
+class RawOutput(models.Model):
+    """
+    A command output stored once, compressed, and referenced by all the logs
+    with identical output.
+    """
+    digest = models.CharField(max_length=64, unique=True, editable=False)  #: SHA-256 of the output
+    data = models.BinaryField(default=b'', blank=True, editable=False)  #: Compressed output (see compression)
+
+    objects = RawOutputManager()
+
+    def __str__(self):
+        return self.digest
+
+
+class DiscoveryLogQuerySet(RestrictedQuerySet):
+    def latest_by_command(self):
+        """
+        Return the latest successful log of each command on each
+        Discoverable. Commands are read from the netdoc_log_latest index
+        (an index scan over all the logs of the selected Discoverables, so
+        the cost still grows with their history), then the latest log of
+        each command is looked up on the same index (LIMIT 1), without
+        reading or sorting the logs themselves. The result can be filtered
+        and ordered.
+        """
+        keys_sql, keys_params = self.order_by().values('discoverable_id', 'request', 'command').distinct().query.sql_with_params()
+        table = self.model._meta.db_table
+        latest = RawSQL(f"""
+            SELECT latest.id FROM ({keys_sql}) AS keys
+            CROSS JOIN LATERAL (
+                SELECT id FROM {table}
+                WHERE discoverable_id = keys.discoverable_id AND request = keys.request AND command = keys.command AND success
+                ORDER BY created DESC, id DESC
+                LIMIT 1
+            ) AS latest
+        """, keys_params)
+        return self.filter(success=True, pk__in=latest)
+
+
 class DiscoveryLog(NetBoxModel):
     command = models.CharField(max_length=255, editable=False)  #: Exact CMD line used in Netnmiko discovery
     configuration = models.BooleanField(
@@ -168,17 +347,37 @@ class DiscoveryLog(NetBoxModel):
         related_name='discoverylogs',
         editable=False,
     )
+    duration = models.FloatField(null=True, blank=True, editable=False)  #: Seconds spent executing the command (see adaptive)
+    run = models.ForeignKey(
+        to=DiscoveryRun,
+        on_delete=models.SET_NULL,
+        related_name='discoverylogs',
+        blank=True,
+        null=True,
+        editable=False,
+    )
     parsed_output = models.JSONField(default=list, editable=False)
-    raw_output = models.TextField(
-        default="", blank=True, editable=False,
+    raw_output_blob = models.ForeignKey(
+        to=RawOutput,
+        on_delete=models.PROTECT,
+        related_name='+',
+        blank=True,
+        null=True,
+        editable=False,
     )
     request = models.CharField(max_length=255, editable=False)  #: API request used in Netnmiko discovery (define the template parser)
     success = models.BooleanField(default=False, editable=False) # True if excuting request return OK and raw_output is valid (avoid command not found)
     parsed = models.BooleanField(default=False, editable=False)  #: True if parsing raw_output return a valid JSON
     ingested = models.BooleanField(default=False, editable=False)  #: True if all data are ingested without errors
 
+    objects = DiscoveryLogQuerySet.as_manager()
+
     class Meta:
         ordering = ('created',)
+        indexes = [
+            # Latest log of each command (see DiscoveryLogQuerySet.latest_by_command)
+            models.Index(fields=['discoverable', 'request', 'command', '-created'], name='netdoc_log_latest'),
+        ]
         verbose_name = 'Log'
         verbose_name_plural = 'Logs'
 
@@ -188,6 +387,27 @@ class DiscoveryLog(NetBoxModel):
     def get_absolute_url(self):
         return reverse('plugins:netdoc:discoverylog', args=[self.pk])
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.raw_output_blob_id is None and hasattr(self, '_raw_output'):
+                self.raw_output_blob = RawOutput.objects.for_texts([self._raw_output])[compression.digest(self._raw_output)]
+            super().save(*args, **kwargs)
+
+    @property
+    def raw_output(self):
+        """
+        Command output, decompressed on first access.
+        """
+        if not hasattr(self, '_raw_output'):
+            self._raw_output = compression.decompress(self.raw_output_blob.data) if self.raw_output_blob_id else ''
+        return self._raw_output
+
+    @raw_output.setter
+    def raw_output(self, value):
+        # RawOutput is set on save (see RawOutputManager.for_texts)
+        self._raw_output = value or ''
+        self.raw_output_blob = None
+
 
 #
 # MacAddressTableEntry model
@@ -55,6 +55,10 @@ menu_items = (
         link='plugins:netdoc:routingtable_list',
         link_text='Routing Table',
     ),
+    PluginMenuItem(
+        link='plugins:netdoc:discoveryrun_list',
+        link_text='Runs',
+    ),
     PluginMenuItem(
         link='plugins:netdoc:discoverylog_list',
         link_text='Logs',
@@ -2,7 +2,10 @@
 Custom Inventory for Nornir.
 """
 from nornir.core.inventory import Inventory, Host, Hosts, Group, Groups, ParentGroups, Defaults, ConnectionOptions
+from . import PLUGIN_SETTINGS
 from . import models
+from . import registry
+from . import adaptive
 
 class AssetInventory:
     """
@@ -23,11 +26,31 @@ class AssetInventory:
         },
         inventory={
             "plugin": "asset-inventory",
+            "options": {
+                "addresses": ["172.25.82.34", "172.25.82.39"],
+            },
         },
         logging={"enabled": False},
     )
+
+    Options (filters are applied in the database query):
+    * addresses: load only Discoverables with the given addresses;
+    * mode: load only Discoverables with the given mode (or list of modes);
+    * profile: command profile for all hosts (see registry), default is
+      the profile of each Discoverable;
+    * run_id: DiscoveryRun of the discovery (see runs);
+    * exclude: command names to be skipped as {discoverable_id: names};
+    * vrfs: VRF lists of hosts skipping show vrf as {discoverable_id: vrfs}.
     """
 
+    def __init__(self, addresses=None, mode=None, profile=None, run_id=None, exclude=None, vrfs=None):
+        self.addresses = addresses
+        self.mode = mode
+        self.profile = profile
+        self.run_id = run_id
+        self.exclude = exclude or {}
+        self.vrfs = vrfs or {}
+
     def load(self) -> Inventory:
         """
         Load items from remote API.
@@ -36,22 +59,43 @@ class AssetInventory:
         hosts = Hosts()
         groups = Groups()
 
-        discoverables = models.Discoverable.objects.filter(discoverable=True)
-        
+        discoverables = models.Discoverable.objects.filter(discoverable=True, mode__startswith="netmiko_")
+        if self.addresses is not None:
+            discoverables = discoverables.filter(address__in=self.addresses)
+        if isinstance(self.mode, str):
+            discoverables = discoverables.filter(mode=self.mode)
+        elif self.mode:
+            discoverables = discoverables.filter(mode__in=self.mode)
+        discoverables = list(discoverables.select_related("credential", "site"))
+
+        # Previous command durations, used for read timeouts (see adaptive)
+        history = adaptive.load_history([discoverable.pk for discoverable in discoverables])
+
         # Add "all" group
         groups["all"] = Group("all")
 
         # Load discoverable hosts
-        for discoverable in models.Discoverable.objects.filter(discoverable=True):
+        for discoverable in discoverables:
 
             if discoverable.mode.startswith("netmiko_"):
                 credential = discoverable.credential
                 # Add hosts discoverable via Netmiko
                 device_type = "_".join(discoverable.mode.split("_")[1:])
                 data = {
+                    "discoverable_id": discoverable.pk,
+                    "profile": self.profile or registry.profile_for(discoverable),
+                    "fingerprint": discoverable.fingerprint,
+                    "last_discovered_by_class": discoverable.last_discovered_by_class,
+                    "history": history.get(discoverable.pk, {}),
+                    "run_id": self.run_id,
+                    "exclude": self.exclude.get(discoverable.pk, set()),
+                    "credential_id": discoverable.credential_id,
                     "site_id": discoverable.site.pk,
                     "site": discoverable.site.slug,
                 }
+                if discoverable.pk in self.vrfs:
+                    # show vrf already collected (resumed run)
+                    data["vrfs"] = self.vrfs[discoverable.pk]
 
                 host_key = discoverable.address
                 host_groups = [device_type, f'site-{data["site"]}']
@@ -65,7 +109,7 @@ class AssetInventory:
                     hostname=discoverable.address,
                     username=credential.username,
                     password=credential.password,
-                    port=22,
+                    port=PLUGIN_SETTINGS.get('SSH_PORT'),
                     platform=device_type,
                     data=data,
                     groups=ParentGroups(),
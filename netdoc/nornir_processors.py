@@ -0,0 +1,47 @@
+"""
+Custom Processors for Nornir.
+"""
+
+
+class PipelineProcessor:
+    """
+    PipelineProcessor puts the results of each host in a Pipeline as soon as
+    the host completes, without waiting for the whole run. Final is False if
+    more results of the same host will follow (e.g. a later playbook). Can be
+    used with:
+
+    from netdoc.pipeline import Pipeline
+    from netdoc.nornir_processors import PipelineProcessor
+
+    with Pipeline() as pipeline:
+        nr.with_processors([PipelineProcessor(pipeline)]).run(task=multiple_tasks)
+    """
+
+    def __init__(self, pipeline, final=True):
+        self.pipeline = pipeline
+        self.final = final
+
+    def task_started(self, task):
+        pass
+
+    def task_completed(self, task, result):
+        pass
+
+    def task_instance_started(self, task, host):
+        pass
+
+    def task_instance_completed(self, task, host, result):
+        results = []
+        # MultiResult is an array of Result, the first one is the parent task
+        for item in result:
+            if item.name == task.name:
+                # Skip parent task
+                continue
+            results.append((item.name, item.result, getattr(item, "duration", None)))
+        self.pipeline.put(host.data["discoverable_id"], results, final=self.final)
+
+    def subtask_instance_started(self, task, host):
+        pass
+
+    def subtask_instance_completed(self, task, host, result):
+        pass
@@ -0,0 +1,67 @@
+"""
+Custom Runners for Nornir.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from nornir.core.task import AggregatedResult
+from . import adaptive
+from . import nornir_tasks
+
+
+class AdaptiveThreadedRunner:
+    """
+    AdaptiveThreadedRunner runs hosts in a pool of threads like the threaded
+    runner, but the number of hosts running at the same time follows an
+    AdaptiveLimit: it is reduced when hosts fail or commands are slower than
+    usual (see adaptive). Per credential and per site session limits are
+    honoured (see ratelimit): a host keeps its connection and session slot
+    between runs (e.g. per VRF commands), and the connection of the least
+    recently used idle host is closed when another host waits for its slot
+    (see nornir_tasks.close_idle). Connections are closed by the caller
+    (see tasks.collect). Can be registered and used with:
+
+    from nornir.core.plugins.runners import RunnersPluginRegister
+    from netdoc.nornir_runners import AdaptiveThreadedRunner
+
+    RunnersPluginRegister.register("adaptive-threaded", AdaptiveThreadedRunner)
+    nr = InitNornir(
+        runner={
+            "plugin": "adaptive-threaded",
+            "options": {
+                "num_workers": 100,
+            },
+        },
+        ...
+    )
+
+    The limit is kept between runs of the same Nornir object.
+    """
+
+    def __init__(self, num_workers=20):
+        self.num_workers = num_workers
+        self.limit = adaptive.AdaptiveLimit(num_workers)
+        self.limiter = adaptive.ThreadLimiter(self.limit)
+
+    def run(self, task, hosts):
+        result = AggregatedResult(task.name)
+
+        def run_host(host):
+            with self.limiter:
+                nornir_tasks.set_busy(host)
+                try:
+                    multi_result = task.copy().start(host)
+                finally:
+                    # The connection is kept for the next run, closed if another host needs its session slot
+                    nornir_tasks.set_idle(host)
+            slowdowns = [getattr(item, "slowdown", None) for item in multi_result]
+            slowdowns = [slowdown for slowdown in slowdowns if slowdown]
+            self.limit.update(slowdown=max(slowdowns) if slowdowns else None, failed=multi_result.failed)
+            return multi_result
+
+        futures = []
+        with ThreadPoolExecutor(self.num_workers) as pool:
+            for host in hosts:
+                futures.append(pool.submit(run_host, host))
+        for future in futures:
+            worker_result = future.result()
+            result[worker_result.host.name] = worker_result
+        return result
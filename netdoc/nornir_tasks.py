@@ -0,0 +1,99 @@
+"""
+Custom Tasks for Nornir.
+"""
+import logging
+import threading
+import time
+from nornir.core.task import Result
+from . import PLUGIN_SETTINGS
+from . import adaptive
+from . import ratelimit
+from . import session_pool
+
+
+_idle = {} #: Host name: (last used, host), hosts holding a connection between runs (see close_idle)
+_idle_lock = threading.RLock()
+
+
+def send_command(task, command_string, use_textfsm=False, enable=False, **kwargs):
+    """
+    Nornir task replacing netmiko_send_command: execute a command using the
+    Nornir Netmiko connection or a pooled session (SESSION_POOL). The read
+    timeout is derived from previous durations (see adaptive); duration and
+    slowdown are added to the Result.
+    """
+    expected, timeout = adaptive.get_timeout(task.host.data.get("history", {}), task.name)
+    kwargs = {**adaptive.netmiko_timeout_kwargs(timeout), **kwargs}
+
+    start = time.monotonic()
+    if PLUGIN_SETTINGS.get('SESSION_POOL'):
+        output = session_pool.send_command(task.host, command_string, use_textfsm=use_textfsm, enable=enable, **kwargs)
+    else:
+        if "netmiko" not in task.host.connections:
+            # New session and login (see ratelimit), the slot is released by close_connections
+            if "session_slot" not in task.host.data:
+                task.host.data["session_slot"] = ratelimit.open_session(
+                    task.host.data["credential_id"], task.host.data["site_id"],
+                    wait=lambda: close_idle(task.host.data["credential_id"], task.host.data["site_id"]),
+                )
+            ratelimit.login(task.host.data["credential_id"], task.host.data["site_id"])
+            task.host.data["enabled"] = False
+        connection = task.host.get_connection("netmiko", task.nornir.config)
+        if enable and not task.host.data["enabled"]:
+            # Enable mode is kept by the session
+            connection.enable()
+            task.host.data["enabled"] = True
+        output = connection.send_command(command_string, use_textfsm=use_textfsm, **kwargs)
+    duration = time.monotonic() - start
+
+    return Result(host=task.host, result=output, duration=duration, slowdown=adaptive.get_slowdown(duration, expected))
+
+
+def set_busy(host):
+    """
+    Mark a host as running a task: its connection is not closed by
+    close_idle.
+    """
+    with _idle_lock:
+        _idle.pop(host.name, None)
+
+
+def set_idle(host):
+    """
+    Mark a host holding a session slot as idle: its connection is kept for
+    the next run (e.g. per VRF commands) unless another host needs the slot.
+    """
+    if host.data.get("session_slot") is None:
+        return
+    with _idle_lock:
+        _idle[host.name] = (time.monotonic(), host)
+
+
+def close_idle(credential_id, site_id):
+    """
+    Close the connection of the least recently used idle host with the same
+    credential or site, freeing its session slot.
+    """
+    with _idle_lock:
+        candidates = [
+            (last_used, name) for name, (last_used, host) in _idle.items()
+            if host.data["credential_id"] == credential_id or host.data["site_id"] == site_id
+        ]
+        if not candidates:
+            return
+        # Closed while holding the lock, so the host cannot start a task meanwhile
+        close_connections(_idle[min(candidates)[1]][1])
+
+
+def close_connections(host):
+    """
+    Close the Nornir connections of a host and release its session slot.
+    """
+    set_busy(host)
+    try:
+        host.close_connections()
+    except Exception as err:
+        logging.debug(f'Failed to close connections of {host}: {err}')
+    slot = host.data.pop("session_slot", None)
+    if slot is not None:
+        ratelimit.close_session(slot)
@@ -0,0 +1,242 @@
+"""
+Parse/ingest pipeline.
+
+Collectors put the results of each host in a bounded queue as soon as they are
+available; a pool of worker threads drains the queue creating, parsing and
+ingesting logs. This way ingestion overlaps collection and the total time is
+roughly the slowest of the two. Results of the same host are always handled by
+the same worker, in the order they are added.
+
+Usage:
+
+    with Pipeline(run_id=run_id) as pipeline:
+        pipeline.put(discoverable_id, [(request, raw_output, duration), ...])
+
+If run_id is set, logs are linked to the DiscoveryRun and host progress is
+updated (see runs).
+
+If INGEST_QUEUE is set, workers only store the logs and enqueue an ingestion
+job per host and put (tasks.ingest) on that RQ queue, so collection and
+ingestion are scaled with separate worker pools. Ingestion jobs of the same
+host depend on each other, so they are executed in order; a failed job does
+not block the following ones, and the host fails if its last job fails.
+"""
+import logging
+import queue
+import threading
+import django_rq
+from rq.job import Dependency
+from django.db import connection
+from django.utils import timezone
+from . import PLUGIN_SETTINGS
+from . import models
+from . import functions
+from . import registry
+from . import runs
+
+
+INGEST_JOB_KEY = "netdoc:ingest:{}:{}" #: Last ingestion job of a host in a run
+
+
+class Pipeline:
+    def __init__(self, workers=None, size=None, run_id=None, queue_name=None):
+        self.run_id = run_id
+        if queue_name is None:
+            queue_name = PLUGIN_SETTINGS.get('INGEST_QUEUE')
+        self.queue_name = queue_name
+        self.jobs = {} # discoverable_id: last ingestion job
+        if not workers:
+            workers = PLUGIN_SETTINGS.get('INGEST_WORKERS')
+        if not size:
+            size = PLUGIN_SETTINGS.get('INGEST_QUEUE_SIZE')
+        # One queue per worker: results of a host are sent to the same worker
+        self.queues = [queue.Queue(maxsize=max(1, size // workers)) for i in range(0, workers)]
+        self.threads = [threading.Thread(target=self._worker, args=(q,), daemon=True) for q in self.queues]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.join()
+
+    def start(self):
+        """
+        Start the worker pool.
+        """
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, discoverable_id, results, final=True):
+        """
+        Add the results of a host, final is False if more results of the same
+        host will follow. Block if the queue is full, so collectors slow down if
+        ingestion cannot keep up.
+        """
+        self.queues[discoverable_id % len(self.queues)].put((discoverable_id, results, final))
+
+    def join(self):
+        """
+        Wait until all queued results are ingested and stop the worker pool.
+        """
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _worker(self, q):
+        try:
+            while True:
+                item = q.get()
+                if item is None:
+                    # Pipeline is closing
+                    break
+                discoverable_id, results, final = item
+                try:
+                    if self.queue_name:
+                        job = enqueue_ingest(
+                            discoverable_id, results, self.queue_name, run_id=self.run_id, final=final,
+                            depends_on=self.jobs.get(discoverable_id),
+                        )
+                        if job:
+                            self.jobs[discoverable_id] = job
+                    else:
+                        ingest(discoverable_id, results, run_id=self.run_id, final=final)
+                except Exception as err:
+                    logging.error(f'Failed to ingest results for Discoverable {discoverable_id}: {err}')
+        finally:
+            # Each thread has its own DB connection
+            connection.close()
+
+
+def ingest(discoverable_id, results, run_id=None, final=True):
+    """
+    Create, parse and ingest logs from the results of a host. Results are
+    processed in execution order (show version must be ingested first).
+    """
+    if not results:
+        if run_id and final:
+            # Earlier results of the host have been ingested
+            runs.completed(run_id, discoverable_id)
+        return
+    if run_id:
+        runs.collected(run_id, discoverable_id)
+    logs = store(discoverable_id, results, run_id=run_id, parse=True)
+    process_logs(discoverable_id, logs, run_id=run_id, final=final, parse=False)
+
+
+def enqueue_ingest(discoverable_id, results, queue_name, run_id=None, final=True, depends_on=None):
+    """
+    Create the logs from the results of a host and enqueue their parsing and
+    ingestion (tasks.ingest) after depends_on. Return the job. Empty final
+    results are enqueued to complete a host with earlier results.
+    """
+    from . import tasks
+
+    if not results and not (final and depends_on):
+        return None
+    if run_id:
+        # Ingesting hosts are not failed when the collection job finishes
+        runs.collected(run_id, discoverable_id, ingesting=final)
+    # Parsing is left to ingestion jobs
+    logs = store(discoverable_id, results, run_id=run_id, parse=False)
+    if depends_on:
+        # Run after the previous job even if it failed
+        depends_on = Dependency(jobs=[depends_on], allow_failure=True)
+    job = django_rq.get_queue(queue_name).enqueue(
+        tasks.ingest,
+        discoverable_id,
+        [log.pk for log in logs],
+        run_id=run_id,
+        final=final,
+        depends_on=depends_on,
+        on_failure=tasks.ingest_failed if run_id and final else None,
+    )
+    if run_id and final:
+        # Runs deferred by the lease of the host run after this job (see coordinator.defer)
+        django_rq.get_connection(queue_name).set(INGEST_JOB_KEY.format(run_id, discoverable_id), job.id, ex=PLUGIN_SETTINGS.get('LEASE_TTL'))
+    return job
+
+
+def get_ingest_job_id(run_id, discoverable_id):
+    """
+    Return the ID of the last ingestion job of a host in a run (None if not
+    enqueued or expired).
+    """
+    queue_name = PLUGIN_SETTINGS.get('INGEST_QUEUE')
+    if not queue_name or not discoverable_id:
+        return None
+    job_id = django_rq.get_connection(queue_name).get(INGEST_JOB_KEY.format(run_id, discoverable_id))
+    return job_id.decode() if job_id else None
+
+
+def store(discoverable_id, results, run_id=None, parse=True):
+    """
+    Create the logs from the results of a host with one query (parsed in
+    memory before if parse is set, see functions.log_bulk_create), update the
+    Discoverable and return the logs.
+    """
+    if not results:
+        return []
+    discoverable = models.Discoverable.objects.select_related('credential', 'site').get(pk=discoverable_id)
+    platform = "_".join(discoverable.mode.split("_")[1:])
+    now = timezone.now()
+    discoverable.last_discovered_at = now # Update last_discovered_at
+    fingerprint = None
+    failed = set()
+    for request, raw_output, duration in results:
+        name = request
+        request = request.split('|').pop(0)
+        if request == registry.FINGERPRINT:
+            fingerprint = functions.fingerprint(raw_output)
+            continue
+
+        # Update last_discovered_by_class (used by scheduler and fingerprint)
+        command = registry.get_command(platform, request)
+        if command:
+            discoverable.last_discovered_by_class[command.command_class] = now.isoformat()
+            if command.command_class not in registry.VOLATILE and not functions.valid_output(raw_output):
+                failed.add((request, name.split('|', 1).pop()))
+
+    recorded = fingerprint == discoverable.fingerprint and registry.FINGERPRINT in discoverable.last_discovered_by_class
+    if fingerprint and not recorded and not succeeded_before(discoverable_id, failed):
+        # Record a changed fingerprint only if the configuration derived
+        # commands of this run succeeded; commands which never succeeded on
+        # the device (e.g. show glbp without GLBP) are ignored
+        discoverable.fingerprint = fingerprint
+        discoverable.last_discovered_by_class[registry.FINGERPRINT] = now.isoformat()
+    discoverable.save(update_fields=['last_discovered_at', 'last_discovered_by_class', 'fingerprint'])
+
+    logs = []
+    for request, raw_output, duration in results:
+        # Log locally
+        logs.append(functions.log_build(
+            discoverable=discoverable,
+            raw_output=raw_output,
+            request=request,
+            duration=duration,
+            run_id=run_id,
+        ))
+    return functions.log_bulk_create(logs, parse=parse)
+
+
+def succeeded_before(discoverable_id, commands):
+    """
+    Return the (request, command) pairs which succeeded in an earlier log
+    of a Discoverable.
+    """
+    if not commands:
+        return set()
+    logs = models.DiscoveryLog.objects.filter(
+        discoverable_id=discoverable_id, success=True, request__in=set(request for request, command in commands),
+    ).values_list('request', 'command').distinct()
+    return set(logs) & commands
+
+
+def process_logs(discoverable_id, logs, run_id=None, final=True, parse=True):
+    """
+    Parse (if parse is set) and ingest the logs of a host, in order.
+    """
+    logs = functions.log_bulk_process(logs, parse=parse)
+    if run_id:
+        runs.ingested(run_id, discoverable_id, logs, final=final)
@@ -0,0 +1,73 @@
+"""
+TCP reachability pre-flight scan.
+
+Probe the SSH port of all addresses concurrently with a short timeout before
+starting collectors, so unreachable devices do not hold a collector slot until
+the SSH connect timeout expires.
+"""
+import asyncio
+from . import PLUGIN_SETTINGS
+from . import models
+from . import functions
+
+
+REQUEST = "tcp reachability" #: Request used for failure logs
+
+
+async def probe(address, port, timeout, semaphore):
+    """
+    Open and close a TCP connection. Return None if the port is reachable,
+    the error otherwise.
+    """
+    async with semaphore:
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout=timeout)
+        except asyncio.TimeoutError:
+            return f'timeout after {timeout}s'
+        except OSError as err:
+            return str(err)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+    return None
+
+
+async def scan(addresses, port=None, timeout=None, max_sessions=None):
+    """
+    Probe all addresses concurrently. Return a dict address: error (None if
+    reachable).
+    """
+    if not port:
+        port = PLUGIN_SETTINGS.get('SSH_PORT')
+    if not timeout:
+        timeout = PLUGIN_SETTINGS.get('PREFLIGHT_TIMEOUT')
+    if not max_sessions:
+        max_sessions = PLUGIN_SETTINGS.get('MAX_SESSIONS')
+    semaphore = asyncio.Semaphore(max_sessions)
+    errors = await asyncio.gather(*[probe(address, port, timeout, semaphore) for address in addresses])
+    return dict(zip(addresses, errors))
+
+
+def reachable(addresses, port=None, timeout=None, run_id=None):
+    """
+    Return reachable addresses. A failure log is created for each Discoverable
+    with an unreachable address, linked to the run if run_id is set.
+    """
+    if not port:
+        port = PLUGIN_SETTINGS.get('SSH_PORT')
+    addresses = list(dict.fromkeys(addresses)) # Remove duplicates preserving order
+    errors = asyncio.run(scan(addresses, port=port, timeout=timeout))
+    unreachable = {address: error for address, error in errors.items() if error}
+
+    for discoverable in models.Discoverable.objects.filter(discoverable=True, address__in=unreachable.keys()):
+        # Failed log (see functions.INVALID_RE)
+        functions.log_create(
+            discoverable=discoverable,
+            raw_output=f'% TCP port {port} unreachable: {unreachable[discoverable.address]}',
+            request=REQUEST,
+            run_id=run_id,
+        )
+
+    return [address for address in addresses if address not in unreachable]
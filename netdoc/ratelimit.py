@@ -0,0 +1,175 @@
+"""
+Per credential and per site rate limits.
+
+Protect authentication servers (TACACS/RADIUS) from login storms when many
+hosts start at once:
+
+* new logins per second are limited by token buckets, one per Credential
+  (CREDENTIAL_LOGIN_RATE) and one per Site (SITE_LOGIN_RATE);
+* concurrent sessions are limited by semaphores, one per Credential
+  (CREDENTIAL_SESSIONS) and one per Site (SITE_SESSIONS).
+
+None means unlimited. Limits are enforced within a worker process: when
+shards run on multiple RQ workers, divide them by the number of workers.
+
+A session slot is held from the time a connection is opened until it is
+closed (see open_session and close_session).
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from . import PLUGIN_SETTINGS
+
+
+SLOT_POLL_INTERVAL = 1 #: Seconds between calls of the wait callback while no session slot is free
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate tokens per second, holding up to rate
+    tokens (at least one).
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token. Return the seconds to wait before using it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = self.tokens - 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+
+class RateLimits:
+    """
+    Token buckets and session semaphores keyed by credential and site.
+    Semaphore class is threading.BoundedSemaphore for threaded collectors,
+    asyncio.Semaphore for the asyncio collector.
+    """
+
+    def __init__(self, semaphore_class=threading.BoundedSemaphore):
+        self.semaphore_class = semaphore_class
+        self.buckets = {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get_limits(self, credential_id, site_id):
+        """
+        Return (key, login rate, sessions) for a credential and a site. The
+        order is fixed, so semaphores are always acquired in the same order.
+        """
+        return [
+            (("credential", credential_id), PLUGIN_SETTINGS.get('CREDENTIAL_LOGIN_RATE'), PLUGIN_SETTINGS.get('CREDENTIAL_SESSIONS')),
+            (("site", site_id), PLUGIN_SETTINGS.get('SITE_LOGIN_RATE'), PLUGIN_SETTINGS.get('SITE_SESSIONS')),
+        ]
+
+    def login_delay(self, credential_id, site_id):
+        """
+        Take a login token from each bucket. Return the seconds to wait
+        before logging in.
+        """
+        delay = 0
+        for key, rate, sessions in self.get_limits(credential_id, site_id):
+            if not rate:
+                continue
+            with self.lock:
+                bucket = self.buckets.setdefault(key, TokenBucket(rate))
+            delay = max(delay, bucket.reserve())
+        return delay
+
+    def get_semaphores(self, credential_id, site_id):
+        """
+        Return the session semaphores for a credential and a site.
+        """
+        semaphores = []
+        for key, rate, sessions in self.get_limits(credential_id, site_id):
+            if not sessions:
+                continue
+            with self.lock:
+                if key not in self.semaphores:
+                    self.semaphores[key] = self.semaphore_class(sessions)
+                semaphores.append(self.semaphores[key])
+        return semaphores
+
+
+#: Process wide limits for threaded collectors
+LIMITS = RateLimits()
+
+
+def login(credential_id, site_id, limits=LIMITS):
+    """
+    Wait until a new login is allowed.
+    """
+    delay = limits.login_delay(credential_id, site_id)
+    if delay:
+        time.sleep(delay)
+
+
+def open_session(credential_id, site_id, limits=LIMITS, wait=None):
+    """
+    Take a session slot for a credential and a site when a connection is
+    opened. While no slot is free, wait is called every SLOT_POLL_INTERVAL
+    seconds (e.g. to close idle sessions). Return the slot, to be released
+    with close_session when the connection is closed.
+    """
+    semaphores = limits.get_semaphores(credential_id, site_id)
+    for semaphore in semaphores:
+        while not semaphore.acquire(timeout=SLOT_POLL_INTERVAL):
+            if wait:
+                wait()
+    return semaphores
+
+
+def close_session(slot):
+    """
+    Release a session slot (see open_session).
+    """
+    for semaphore in reversed(slot):
+        semaphore.release()
+
+
+@contextmanager
+def session(credential_id, site_id, limits=LIMITS):
+    """
+    Hold a session slot for a credential and a site.
+    """
+    slot = open_session(credential_id, site_id, limits=limits)
+    try:
+        yield
+    finally:
+        close_session(slot)
+
+
+async def async_login(credential_id, site_id, limits):
+    """
+    Wait until a new login is allowed (asyncio).
+    """
+    delay = limits.login_delay(credential_id, site_id)
+    if delay:
+        await asyncio.sleep(delay)
+
+
+@asynccontextmanager
+async def async_session(credential_id, site_id, limits):
+    """
+    Hold a session slot for a credential and a site (asyncio).
+    """
+    semaphores = limits.get_semaphores(credential_id, site_id)
+    for semaphore in semaphores:
+        await semaphore.acquire()
+    try:
+        yield
+    finally:
+        for semaphore in reversed(semaphores):
+            semaphore.release()
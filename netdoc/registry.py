@@ -0,0 +1,233 @@
+"""
+Command registry.
+
+Commands are declared in discovery_<platform> modules (COMMANDS and
+vrf_commands) as Command objects: each command has collection options, a
+command class (what it collects) and a cost class (how expensive it is for the
+device). The registry maps platform and request to commands, and selects
+commands using profiles.
+
+A profile is a dict with:
+* classes: list of command classes to collect (None means all);
+* costs: list of cost classes to collect (None means all).
+
+The profile of a Discoverable is, in order: Discoverable.profile, the profile
+of its site (SITE_PROFILES), DEFAULT_PROFILE.
+
+Platforms can define a FINGERPRINT command: it is executed first and, if its
+output is the same as the recorded one, non VOLATILE command classes collected
+since the fingerprint was recorded (less than FINGERPRINT_MAX_AGE seconds
+ago) are skipped (see get_skipped_classes). An EXPENSIVE fingerprint is
+executed only by profiles including EXPENSIVE configuration derived commands.
+"""
+import datetime
+import importlib
+from django.utils.dateparse import parse_datetime
+from . import PLUGIN_SETTINGS
+
+
+# Cost classes
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+# Command classes
+CONFIG = "config" #: Configuration
+LOGGING = "logging" #: Logs
+INVENTORY = "inventory" #: Device, VLANs, VRFs...
+INTERFACES = "interfaces" #: Interfaces, switchports, port-channels, IP addresses
+NEIGHBORS = "neighbors" #: CDP/LLDP neighbors
+PROTOCOLS = "protocols" #: L2/L3 protocols (STP, FHRP, routing adjacencies)
+VRF = "vrf" #: VRF list, required by per VRF commands
+ARP = "arp" #: ARP table
+MAC = "mac" #: MAC address table
+ROUTE = "route" #: Routing table
+FINGERPRINT = "fingerprint" #: Cheap output changing when the configuration changes
+
+VOLATILE = [VRF, ARP, MAC, ROUTE] #: Classes collected even if the fingerprint is unchanged
+
+PROFILES = {
+    "full": {"classes": None, "costs": None},
+    "fast": {"classes": None, "costs": [CHEAP]},
+    # Tables are ingested on the Device found by show version (INVENTORY)
+    "l2-fast": {"classes": [INVENTORY, VRF, ARP, MAC], "costs": None},
+    "routing": {"classes": [INVENTORY, VRF, ROUTE], "costs": None},
+}
+
+
+class UnknownProfile(Exception):
+    pass
+
+
+class Command:
+    """
+    A command executed on a device. Name is the request (template parser),
+    optionally followed by |command if they differ (e.g. 'show ip arp|show ip
+    arp vrf x'). Options are passed to Netmiko send_command.
+    """
+
+    def __init__(self, name, command_string, command_class, cost=CHEAP, **options):
+        self.name = name
+        self.command_string = command_string
+        self.command_class = command_class
+        self.cost = cost
+        self.options = options
+
+    def __repr__(self):
+        return f'<Command {self.name} ({self.command_class}, {self.cost})>'
+
+    @property
+    def request(self):
+        return self.name.split('|').pop(0)
+
+    def task_kwargs(self):
+        """
+        Return send_command task arguments.
+        """
+        return {"name": self.name, "command_string": self.command_string, **self.options}
+
+
+def get_platform(platform):
+    """
+    Return the discovery module of a platform (e.g. cisco_ios).
+    """
+    return importlib.import_module(f'netdoc.discovery_{platform}')
+
+
+def get_profiles():
+    """
+    Return built-in and configured profiles.
+    """
+    return {**PROFILES, **PLUGIN_SETTINGS.get('PROFILES', {})}
+
+
+def get_profile(name=None):
+    """
+    Return a profile, DEFAULT_PROFILE if name is not set.
+    """
+    if not name:
+        name = PLUGIN_SETTINGS.get('DEFAULT_PROFILE')
+    try:
+        return get_profiles()[name]
+    except KeyError:
+        raise UnknownProfile(f'Profile {name} is not defined')
+
+
+def profile_choices():
+    """
+    Return profile choices for forms.
+    """
+    return [("", "---------")] + [(name, name) for name in get_profiles()]
+
+
+def profile_for(discoverable):
+    """
+    Return the profile name of a Discoverable.
+    """
+    if discoverable.profile:
+        return discoverable.profile
+    site_profile = PLUGIN_SETTINGS.get('SITE_PROFILES', {}).get(discoverable.site.slug)
+    if site_profile:
+        return site_profile
+    return PLUGIN_SETTINGS.get('DEFAULT_PROFILE')
+
+
+def select(commands, profile=None, skip_classes=None, exclude=None):
+    """
+    Return commands included in a profile (name). Commands with a class in
+    skip_classes (see get_skipped_classes) or a name in exclude (e.g. already
+    collected by a resumed run) are skipped.
+    """
+    profile = get_profile(profile)
+    skip_classes = skip_classes or ()
+    exclude = exclude or ()
+    return [
+        command for command in commands
+        if (profile.get("classes") is None or command.command_class in profile["classes"])
+        and (profile.get("costs") is None or command.cost in profile["costs"])
+        and command.command_class not in skip_classes
+        and command.name not in exclude
+    ]
+
+
+def use_fingerprint(platform, profile=None):
+    """
+    Return True if the fingerprint should be collected: the platform defines
+    it and the profile includes non VOLATILE commands at least as expensive
+    (e.g. an EXPENSIVE fingerprint is not worth skipping show version).
+    """
+    if not PLUGIN_SETTINGS.get('FINGERPRINT'):
+        return False
+    fingerprint_command = getattr(get_platform(platform), "FINGERPRINT", None)
+    if not fingerprint_command:
+        return False
+    for command in get_commands(platform, profile=profile):
+        if command.command_class in VOLATILE:
+            continue
+        if fingerprint_command.cost == CHEAP or command.cost == EXPENSIVE:
+            return True
+    return False
+
+
+def get_skipped_classes(fingerprint, discoverable_fingerprint, last_discovered_by_class, now=None):
+    """
+    Return the non VOLATILE command classes to skip: the fingerprint is the
+    same as the recorded one and the class was collected since the
+    fingerprint was recorded, less than FINGERPRINT_MAX_AGE seconds ago
+    (neighbors and uptime change without configuration changes). Classes
+    not collected since (e.g. not included in the profile of that run) are
+    collected.
+    """
+    if not fingerprint or fingerprint != discoverable_fingerprint:
+        return set()
+    recorded_at = last_discovered_by_class.get(FINGERPRINT)
+    if not recorded_at:
+        return set()
+    recorded_at = parse_datetime(recorded_at)
+    if not now:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    max_age = PLUGIN_SETTINGS.get('FINGERPRINT_MAX_AGE')
+    skip_classes = set()
+    for command_class, discovered_at in last_discovered_by_class.items():
+        if command_class in VOLATILE or command_class == FINGERPRINT:
+            continue
+        discovered_at = parse_datetime(discovered_at)
+        if discovered_at < recorded_at:
+            continue
+        if max_age is not None and (now - discovered_at).total_seconds() >= max_age:
+            continue
+        skip_classes.add(command_class)
+    return skip_classes
+
+
+def get_commands(platform, profile=None):
+    """
+    Return commands for a platform included in a profile.
+    """
+    return select(get_platform(platform).COMMANDS, profile=profile)
+
+
+def get_vrf_commands(platform, vrfs, profile=None):
+    """
+    Return per VRF commands for a platform included in a profile.
+    """
+    return select(get_platform(platform).vrf_commands(vrfs), profile=profile)
+
+
+def get_profile_classes(platform, profile=None):
+    """
+    Return the command classes collected by a profile on a platform.
+    """
+    commands = get_commands(platform, profile=profile) + get_vrf_commands(platform, ["default"], profile=profile)
+    return sorted(set(command.command_class for command in commands))
+
+
+def get_command(platform, request):
+    """
+    Return the first command of a platform matching a request (including per
+    VRF commands for the default VRF) or None.
+    """
+    platform_module = get_platform(platform)
+    for command in platform_module.COMMANDS + platform_module.vrf_commands(["default"]):
+        if command.request == request:
+            return command
+    return None
@@ -0,0 +1,134 @@
+"""
+DiscoveryLog retention.
+
+Logs are deleted when they are older than LOG_RETENTION_DAYS and are not
+among the LOG_RETENTION_LOGS latest logs of the same command on the same
+Discoverable (either setting can be None). Logs are deleted with set-based
+queries in batches of PRUNE_BATCH_SIZE, walking the table by ID, without
+loading objects or sending signals (nothing references DiscoveryLog), then
+RawOutputs no longer referenced are deleted the same way. Each batch is a
+single DELETE statement; RawOutputs being reused by a discovery are locked
+(see RawOutputManager.for_texts), and a batch conflicting with a discovery
+is retried.
+
+Pruning runs with: manage.py netdoc_prune (e.g. daily from cron).
+"""
+import datetime
+import logging
+from django.db import connection, transaction, IntegrityError
+from django.utils import timezone
+from . import PLUGIN_SETTINGS
+
+
+# Logs older than cutoff with at least keep newer logs of the same command
+# (bounded lookup on the netdoc_log_latest index)
+EXPIRED_LOGS_WHERE = """
+log.created < %(cutoff)s AND (
+    SELECT count(*) FROM (
+        SELECT 1 FROM netdoc_discoverylog AS newer
+        WHERE newer.discoverable_id = log.discoverable_id
+            AND newer.request = log.request
+            AND newer.command = log.command
+            AND (newer.created, newer.id) > (log.created, log.id)
+        LIMIT %(keep)s
+    ) AS newer_logs
+) >= %(keep)s
+"""
+
+COUNT_EXPIRED_LOGS_SQL = f"""
+SELECT count(*) FROM netdoc_discoverylog AS log
+WHERE {EXPIRED_LOGS_WHERE}
+"""
+
+DELETE_EXPIRED_LOGS_SQL = f"""
+DELETE FROM netdoc_discoverylog WHERE id IN (
+    SELECT id FROM netdoc_discoverylog AS log
+    WHERE log.id > %(after)s AND {EXPIRED_LOGS_WHERE}
+    ORDER BY log.id
+    LIMIT %(batch_size)s
+)
+RETURNING id
+"""
+
+DELETE_ORPHAN_RAW_OUTPUTS_SQL = """
+DELETE FROM netdoc_rawoutput WHERE id IN (
+    SELECT id FROM netdoc_rawoutput AS raw_output
+    WHERE raw_output.id > %(after)s AND NOT EXISTS (
+        SELECT 1 FROM netdoc_discoverylog WHERE raw_output_blob_id = raw_output.id
+    )
+    ORDER BY raw_output.id
+    LIMIT %(batch_size)s
+)
+RETURNING id
+"""
+
+
+def get_cutoff(days=None):
+    """
+    Return the date logs must be older than to be deleted.
+    """
+    cutoff = timezone.now()
+    if days is not None:
+        cutoff = cutoff - datetime.timedelta(days=days)
+    return cutoff
+
+
+def count_expired_logs(days=None, keep=None):
+    """
+    Return the number of logs to delete.
+    """
+    if days is None and keep is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(COUNT_EXPIRED_LOGS_SQL, {"cutoff": get_cutoff(days), "keep": keep or 0})
+        return cursor.fetchone()[0]
+
+
+def delete_in_batches(sql, params, batch_size):
+    """
+    Execute a DELETE ... RETURNING id statement selecting rows with ID
+    greater than after, one transaction per batch, until no rows are left.
+    Batches conflicting with concurrent inserts are retried. Return the
+    number of deleted rows.
+    """
+    deleted = 0
+    after = 0
+    while True:
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, {**params, "after": after, "batch_size": batch_size})
+                ids = [row[0] for row in cursor.fetchall()]
+        except IntegrityError as err:
+            # Rows referenced meanwhile, the batch is selected again
+            logging.warning(f'Retrying prune batch: {err}')
+            continue
+        if not ids:
+            return deleted
+        deleted += len(ids)
+        after = max(ids)
+
+
+def prune(days=None, keep=None, batch_size=None, dry_run=False):
+    """
+    Delete expired logs and orphaned RawOutputs. Return the number of deleted
+    logs and RawOutputs (to be deleted if dry_run is set).
+    """
+    if days is None:
+        days = PLUGIN_SETTINGS.get('LOG_RETENTION_DAYS')
+    if keep is None:
+        keep = PLUGIN_SETTINGS.get('LOG_RETENTION_LOGS')
+    if not batch_size:
+        batch_size = PLUGIN_SETTINGS.get('PRUNE_BATCH_SIZE')
+
+    if dry_run:
+        return count_expired_logs(days=days, keep=keep), 0
+
+    deleted_logs = 0
+    if days is not None or keep is not None:
+        deleted_logs = delete_in_batches(DELETE_EXPIRED_LOGS_SQL, {"cutoff": get_cutoff(days), "keep": keep or 0}, batch_size)
+    logging.info(f'Deleted {deleted_logs} logs')
+
+    deleted_raw_outputs = delete_in_batches(DELETE_ORPHAN_RAW_OUTPUTS_SQL, {}, batch_size)
+    logging.info(f'Deleted {deleted_raw_outputs} raw outputs')
+
+    return deleted_logs, deleted_raw_outputs
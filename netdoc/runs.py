@@ -0,0 +1,237 @@
+"""
+Discovery run progress.
+
+Each host of a DiscoveryRun is:
+* pending: waiting to be collected;
+* collected: outputs collected, waiting to be parsed and ingested;
+* ingesting: all outputs collected, parsing and ingestion enqueued on
+  INGEST_QUEUE (see pipeline);
+* completed: outputs parsed and ingested;
+* failed: no output collected (unreachable device, login failure...);
+* canceled: skipped because the run has been canceled.
+
+Runs are resumed with coordinator.resume(): hosts not completed are
+discovered again, skipping commands already collected successfully in the
+run. Runs are canceled with coordinator.cancel(): collectors stop starting new
+hosts, in-flight hosts are collected and ingested.
+
+A host is collected by one run at a time (see leases): the lease is acquired
+when a shard starts collecting the host and released when the host is
+finished. Hosts leased by another run are deferred to a new job of the run
+(see coordinator.defer).
+"""
+import time
+from contextlib import contextmanager
+from django.db.models import F
+from . import leases
+from . import models
+from . import registry
+from .models import DiscoveryRunStatusChoices, DiscoveryRunHostStatusChoices
+
+
+CANCEL_CHECK_INTERVAL = 5 #: Seconds between database checks of the run status
+
+COLLECTING = [DiscoveryRunHostStatusChoices.STATUS_PENDING, DiscoveryRunHostStatusChoices.STATUS_COLLECTED]
+
+UNFINISHED = COLLECTING + [DiscoveryRunHostStatusChoices.STATUS_INGESTING]
+
+_canceled = {} # run_id: (checked at, canceled)
+
+
+def create(addresses, profile=None, queue="default"):
+    """
+    Create a run with a pending host for each discoverable address. The
+    Discoverables are locked until the end of the transaction, so runs
+    created at the same time for the same hosts are coalesced in order (see
+    coalesce).
+    """
+    run = models.DiscoveryRun.objects.create(profile=profile or '', queue=queue)
+    discoverables = models.Discoverable.objects.filter(
+        discoverable=True, mode__startswith="netmiko_", address__in=addresses,
+    ).select_for_update(no_key=True).order_by('pk')
+    models.DiscoveryRunHost.objects.bulk_create([
+        models.DiscoveryRunHost(run=run, discoverable=discoverable) for discoverable in discoverables
+    ])
+    update_status(run.pk)
+    return run
+
+
+def coalesce(run):
+    """
+    Hosts of a new run not finished in an active run with the same profile
+    and queue join that run: they are removed from the new run. Return the
+    IDs of the joined runs. Must be called in the transaction of create: a
+    run created meanwhile for the same hosts waits for the Discoverable
+    locks, then joins this run. Leases are not acquired here: a host queued
+    in a run does not block other runs until a shard collects it (see lease).
+    """
+    holders = dict(models.DiscoveryRunHost.objects.filter(
+        discoverable_id__in=run.hosts.values('discoverable_id'),
+        status__in=UNFINISHED,
+        run__status__in=leases.ACTIVE,
+        # Joining a lower priority run would delay the request
+        run__profile=run.profile,
+        run__queue=run.queue,
+    ).exclude(run=run).values_list('discoverable_id', 'run_id'))
+    if holders:
+        run.hosts.filter(discoverable_id__in=holders).delete()
+    return sorted(set(holders.values()))
+
+
+@contextmanager
+def lease(run_id, addresses):
+    """
+    Acquire the leases of the hosts with the given addresses when a shard
+    starts collecting them, and renew them while the block runs. Hosts
+    collected by other runs are not waited for. Yield the leased addresses
+    and the other hosts as {address: holder run (None if unknown)}.
+    """
+    hosts = dict(models.DiscoveryRunHost.objects.filter(
+        run_id=run_id, discoverable__address__in=addresses
+    ).values_list('discoverable_id', 'discoverable__address'))
+    held = leases.acquire(run_id, list(hosts))
+    leased = [discoverable_id for discoverable_id in hosts if discoverable_id not in held]
+    with leases.renewing(run_id, leased):
+        yield [hosts[discoverable_id] for discoverable_id in leased], {hosts[discoverable_id]: run for discoverable_id, run in held.items()}
+
+
+def start(run_id):
+    """
+    Mark a queued run as running.
+    """
+    models.DiscoveryRun.objects.filter(
+        pk=run_id, status=DiscoveryRunStatusChoices.STATUS_QUEUED
+    ).update(status=DiscoveryRunStatusChoices.STATUS_RUNNING)
+
+
+def is_canceled(run_id, refresh=False):
+    """
+    Return True if a run has been canceled. The database is checked at most
+    every CANCEL_CHECK_INTERVAL seconds, unless refresh is set.
+    """
+    if not run_id:
+        return False
+    checked_at, canceled = _canceled.get(run_id, (0, False))
+    if refresh or time.monotonic() - checked_at >= CANCEL_CHECK_INTERVAL:
+        canceled = models.DiscoveryRun.objects.filter(
+            pk=run_id, status__in=[DiscoveryRunStatusChoices.STATUS_CANCELING, DiscoveryRunStatusChoices.STATUS_CANCELED]
+        ).exists()
+        _canceled[run_id] = (time.monotonic(), canceled)
+    return canceled
+
+
+def collected(run_id, discoverable_id, ingesting=False):
+    """
+    Mark a host as collected (ingesting if the last outputs have been
+    enqueued for ingestion).
+    """
+    if ingesting:
+        status = DiscoveryRunHostStatusChoices.STATUS_INGESTING
+    else:
+        status = DiscoveryRunHostStatusChoices.STATUS_COLLECTED
+    models.DiscoveryRunHost.objects.filter(
+        run_id=run_id, discoverable_id=discoverable_id
+    ).update(status=status)
+
+
+def ingested(run_id, discoverable_id, logs, final=True):
+    """
+    Count parsed and ingested logs of a host. The host is completed if final
+    is set (no more results will follow).
+    """
+    counts = {
+        "logs": F('logs') + len(logs),
+        "parsed": F('parsed') + len([log for log in logs if log and log.parsed]),
+        "ingested": F('ingested') + len([log for log in logs if log and log.ingested]),
+    }
+    if final:
+        counts["status"] = DiscoveryRunHostStatusChoices.STATUS_COMPLETED
+    models.DiscoveryRunHost.objects.filter(run_id=run_id, discoverable_id=discoverable_id).update(**counts)
+    if final:
+        leases.release(run_id, [discoverable_id])
+
+
+def completed(run_id, discoverable_id):
+    """
+    Mark a collected host as completed (no more results will follow).
+    """
+    models.DiscoveryRunHost.objects.filter(
+        run_id=run_id, discoverable_id=discoverable_id, status=DiscoveryRunHostStatusChoices.STATUS_COLLECTED
+    ).update(status=DiscoveryRunHostStatusChoices.STATUS_COMPLETED)
+    leases.release(run_id, [discoverable_id])
+
+
+def failed(run_id, discoverable_id):
+    """
+    Mark an ingesting host as failed (its last ingestion job failed), release
+    its lease and update the run status.
+    """
+    models.DiscoveryRunHost.objects.filter(
+        run_id=run_id, discoverable_id=discoverable_id, status=DiscoveryRunHostStatusChoices.STATUS_INGESTING
+    ).update(status=DiscoveryRunHostStatusChoices.STATUS_FAILED)
+    leases.release(run_id, [discoverable_id])
+    update_status(run_id)
+
+
+def finish(run_id, addresses):
+    """
+    Mark hosts with the given addresses not collected as failed (canceled if
+    the run has been canceled), release their leases and update the run
+    status. Ingesting hosts are left to ingestion jobs.
+    """
+    if is_canceled(run_id):
+        status = DiscoveryRunHostStatusChoices.STATUS_CANCELED
+    else:
+        status = DiscoveryRunHostStatusChoices.STATUS_FAILED
+    hosts = models.DiscoveryRunHost.objects.filter(run_id=run_id, discoverable__address__in=addresses)
+    hosts.filter(status__in=COLLECTING).update(status=status)
+    hosts = hosts.exclude(status=DiscoveryRunHostStatusChoices.STATUS_INGESTING)
+    leases.release(run_id, list(hosts.values_list('discoverable_id', flat=True)))
+    update_status(run_id)
+
+
+def update_status(run_id):
+    """
+    Mark a run as completed (or canceled) if all hosts are finished.
+    """
+    if models.DiscoveryRunHost.objects.filter(run_id=run_id, status__in=UNFINISHED).exists():
+        return
+    models.DiscoveryRun.objects.filter(
+        pk=run_id, status=DiscoveryRunStatusChoices.STATUS_CANCELING
+    ).update(status=DiscoveryRunStatusChoices.STATUS_CANCELED)
+    models.DiscoveryRun.objects.filter(
+        pk=run_id, status__in=[DiscoveryRunStatusChoices.STATUS_QUEUED, DiscoveryRunStatusChoices.STATUS_RUNNING]
+    ).update(status=DiscoveryRunStatusChoices.STATUS_COMPLETED)
+
+
+def completed_commands(run_id):
+    """
+    Return the command names already collected successfully in a run as
+    {discoverable_id: set of names}, used to skip them on resume.
+    """
+    commands = {}
+    if not run_id:
+        return commands
+    logs = models.DiscoveryLog.objects.filter(run_id=run_id, success=True).values_list('discoverable_id', 'request', 'command')
+    for discoverable_id, request, command in logs:
+        name = request if command == request else f'{request}|{command}'
+        commands.setdefault(discoverable_id, set()).add(name)
+    return commands
+
+
+def completed_vrfs(run_id):
+    """
+    Return the VRF lists parsed from the show vrf outputs already collected
+    successfully in a run as {discoverable_id: vrfs}, used by per VRF
+    commands when show vrf is skipped on resume.
+    """
+    vrfs = {}
+    if not run_id:
+        return vrfs
+    logs = models.DiscoveryLog.objects.filter(
+        run_id=run_id, success=True, request="show vrf"
+    ).select_related('discoverable', 'raw_output_blob').order_by('pk')
+    for log in logs:
+        platform = "_".join(log.discoverable.mode.split("_")[1:])
+        vrfs[log.discoverable_id] = registry.get_platform(platform).vrfs_from_output(log.raw_output)
+    return vrfs
@@ -0,0 +1,84 @@
+"""
+Tiered discovery scheduler.
+
+Each schedule runs a profile (see registry) every interval seconds over all
+discoverable devices, e.g. ARP/MAC tables every 10 minutes, routing tables
+hourly and a full discovery nightly:
+
+    'SCHEDULES': {
+        'l2-fast': 600,
+        'routing': 3600,
+        'full': 86400,
+    }
+
+A device is due for a profile when any command class collected by the profile
+is older than the interval (see Discoverable.last_discovered_by_class). Each
+device gets a fixed offset (up to SCHEDULE_JITTER * interval), so devices
+sharing the same schedule are spread over time. Scheduled runs are enqueued
+on the low priority queue (see coordinator.enqueue_scheduled).
+
+The scheduler runs with: manage.py netdoc_scheduler
+"""
+import datetime
+import logging
+import zlib
+import django_rq
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from . import PLUGIN_SETTINGS
+from . import models
+from . import registry
+from . import coordinator
+
+
+SCHEDULED_KEY = "netdoc:scheduled:{}:{}" #: Set while a scheduled discovery is pending
+
+
+def jitter(discoverable, profile, interval):
+    """
+    Return a fixed offset (seconds) for a Discoverable and a profile.
+    """
+    ratio = zlib.crc32(f'{discoverable.pk}:{profile}'.encode()) / 0xffffffff
+    return ratio * interval * PLUGIN_SETTINGS.get('SCHEDULE_JITTER')
+
+
+def is_due(discoverable, profile, interval, now=None):
+    """
+    Return True if a Discoverable should be discovered using a profile.
+    """
+    if not now:
+        now = timezone.now()
+    platform = "_".join(discoverable.mode.split("_")[1:])
+    due_at = now - datetime.timedelta(seconds=interval + jitter(discoverable, profile, interval))
+
+    for command_class in registry.get_profile_classes(platform, profile=profile):
+        last_discovered = discoverable.last_discovered_by_class.get(command_class)
+        if not last_discovered or parse_datetime(last_discovered) <= due_at:
+            return True
+    return False
+
+
+def tick(now=None):
+    """
+    Enqueue discovery for due devices, one run per profile. Return a dict
+    profile: run ID.
+    """
+    connection = django_rq.get_connection("default")
+    discoverables = list(models.Discoverable.objects.filter(discoverable=True, mode__startswith="netmiko_"))
+    runs = {}
+
+    for profile, interval in PLUGIN_SETTINGS.get('SCHEDULES').items():
+        addresses = []
+        for discoverable in discoverables:
+            if not is_due(discoverable, profile, interval, now=now):
+                continue
+            # Skip devices already scheduled and not discovered yet
+            if not connection.set(SCHEDULED_KEY.format(profile, discoverable.pk), 1, nx=True, ex=interval):
+                continue
+            addresses.append(discoverable.address)
+
+        if addresses:
+            runs[profile] = coordinator.enqueue_scheduled(addresses, profile=profile)
+            logging.info(f'Scheduled {profile} discovery on {len(addresses)} devices (run {runs[profile]})')
+
+    return runs
@@ -0,0 +1,194 @@
+"""
+Persistent Netmiko session pool.
+
+Authenticated Netmiko sessions are kept open after each command and reused by
+the next discovery on the same device, saving SSH key exchange, AAA and enable
+on frequent polls. Sessions idle for more than SESSION_POOL_IDLE_TIMEOUT
+seconds are closed by a background thread. Sessions idle for more than
+CHECK_AFTER seconds (e.g. reused by the next discovery) are checked before
+being reused, and enable is sent once per session. Each open
+session holds a session slot (see ratelimit): when no slot is free, the least
+recently used idle session sharing the credential or the site is closed.
+
+The pool lives in the worker process: RQ workers must not fork a new process
+per job, start them with:
+
+    manage.py rqworker --worker-class rq.SimpleWorker
+"""
+import logging
+import threading
+import time
+from netmiko import ConnectHandler
+from . import PLUGIN_SETTINGS
+from . import ratelimit
+
+
+CHECK_AFTER = 10 #: Seconds a session can be idle before being checked on reuse
+EVICT_INTERVAL = 30 #: Maximum seconds between checks for idle sessions to close
+
+
+class SessionPool:
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = idle_timeout
+        self.idle = {} # key: (connection, last used)
+        self.slots = {} # connection: (credential_id, site_id, session slot)
+        self.enabled = set() # connections in enable mode
+        self.lock = threading.Lock()
+        self.evictor = None
+
+    def get_idle_timeout(self):
+        if self.idle_timeout:
+            return self.idle_timeout
+        return PLUGIN_SETTINGS.get('SESSION_POOL_IDLE_TIMEOUT')
+
+    def acquire(self, key, parameters, credential_id=None, site_id=None):
+        """
+        Return an idle healthy session for key, or open a new one taking a
+        session slot and waiting for a login token (see ratelimit).
+        """
+        with self.lock:
+            connection, last_used = self.idle.pop(key, (None, None))
+        if connection:
+            idle = time.monotonic() - last_used
+            if idle < CHECK_AFTER or (idle < self.get_idle_timeout() and is_alive(connection)):
+                # Sessions used by the previous command are not checked again
+                return connection
+            self.disconnect(connection)
+        slot = ratelimit.open_session(credential_id, site_id, wait=lambda: self.close_idle(credential_id, site_id))
+        try:
+            ratelimit.login(credential_id, site_id)
+            connection = ConnectHandler(**parameters)
+        except Exception:
+            ratelimit.close_session(slot)
+            raise
+        with self.lock:
+            self.slots[connection] = (credential_id, site_id, slot)
+        return connection
+
+    def release(self, key, connection):
+        """
+        Return a session to the pool.
+        """
+        with self.lock:
+            previous = self.idle.pop(key, (None, None))[0]
+            self.idle[key] = (connection, time.monotonic())
+            if not self.evictor:
+                # Idle sessions are closed even if no job is running
+                self.evictor = threading.Thread(target=self._evictor, daemon=True)
+                self.evictor.start()
+        if previous:
+            # Only one session per device is kept
+            self.disconnect(previous)
+
+    def disconnect(self, connection):
+        """
+        Close a session and release its session slot.
+        """
+        disconnect(connection)
+        with self.lock:
+            slot = self.slots.pop(connection, (None, None, []))[2]
+            self.enabled.discard(connection)
+        ratelimit.close_session(slot)
+
+    def enable(self, connection):
+        """
+        Enter enable mode once per session.
+        """
+        if connection in self.enabled:
+            return
+        connection.enable()
+        with self.lock:
+            self.enabled.add(connection)
+
+    def close_idle(self, credential_id, site_id):
+        """
+        Close the least recently used idle session with the same credential
+        or site, freeing its session slot.
+        """
+        with self.lock:
+            candidates = [
+                (last_used, key) for key, (connection, last_used) in self.idle.items()
+                if self.slots.get(connection, (None, None, None))[0] == credential_id
+                or self.slots.get(connection, (None, None, None))[1] == site_id
+            ]
+            if not candidates:
+                return
+            connection = self.idle.pop(min(candidates)[1])[0]
+        self.disconnect(connection)
+
+    def evict(self):
+        """
+        Close sessions idle for more than idle_timeout seconds.
+        """
+        now = time.monotonic()
+        with self.lock:
+            expired = [key for key, (connection, last_used) in self.idle.items() if now - last_used >= self.get_idle_timeout()]
+            connections = [self.idle.pop(key)[0] for key in expired]
+        for connection in connections:
+            self.disconnect(connection)
+
+    def _evictor(self):
+        while True:
+            time.sleep(min(EVICT_INTERVAL, self.get_idle_timeout()))
+            try:
+                self.evict()
+            except Exception as err:
+                logging.error(f'Failed to close idle sessions: {err}')
+
+    def close(self):
+        """
+        Close all sessions.
+        """
+        with self.lock:
+            connections = [connection for connection, last_used in self.idle.values()]
+            self.idle = {}
+        for connection in connections:
+            self.disconnect(connection)
+
+
+def is_alive(connection):
+    try:
+        return connection.is_alive()
+    except Exception:
+        return False
+
+
+def disconnect(connection):
+    try:
+        connection.disconnect()
+    except Exception as err:
+        logging.debug(f'Failed to close session: {err}')
+
+
+#: Process wide pool
+POOL = SessionPool()
+
+
+def send_command(host, command_string, use_textfsm=False, enable=False, **kwargs):
+    """
+    Execute a command on a Nornir host using a pooled session. Return the
+    output.
+    """
+    params = host.get_connection_parameters("netmiko")
+    parameters = {
+        "host": params.hostname,
+        "username": params.username,
+        "password": params.password,
+        "port": params.port,
+        "device_type": params.platform,
+        **(params.extras or {}),
+    }
+    key = (host.data["discoverable_id"], params.hostname, params.port, params.username, params.password, params.platform)
+
+    # New sessions and logins are rate limited (see ratelimit)
+    connection = POOL.acquire(key, parameters, credential_id=host.data["credential_id"], site_id=host.data["site_id"])
+    try:
+        if enable:
+            POOL.enable(connection)
+        output = connection.send_command(command_string, use_textfsm=use_textfsm, **kwargs)
+    except Exception:
+        # Broken session
+        POOL.disconnect(connection)
+        raise
+    POOL.release(key, connection)
+    return output
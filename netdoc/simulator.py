@@ -0,0 +1,227 @@
+"""
+Simulated Cisco SSH fleet.
+
+Start N fake IOS, NX-OS and XR devices on loopback addresses (one per device
+from SIMULATOR_NETWORK, listening on SSH_PORT), serving the outputs in
+simulator_fixtures, to load-test collectors without real devices. Latency,
+output size and failure rates are configurable (see SimulatorOptions).
+Matching Discoverables (credential and site "simulator") are created with
+create_discoverables().
+
+The simulator runs in its own process (manage.py netdoc_simulator), so it
+does not compete with the collector for the GIL; benchmark() only drives the
+discovery.
+
+Linux routes the whole 127.0.0.0/8 network to the loopback interface, other
+systems need an alias for each address. Each device and each session uses a
+file descriptor: raise the open files limit accordingly.
+
+Requires asyncssh: pip install asyncssh
+"""
+import asyncio
+import functools
+import ipaddress
+import logging
+import random
+import time
+from django.utils import timezone
+from dcim.models import Site
+from . import PLUGIN_SETTINGS
+from . import models
+from .simulator_fixtures import FIXTURES, PROMPTS, INVALID_INPUT
+
+
+NAME = "simulator" #: Credential name and site slug
+USERNAME = "netdoc"
+PASSWORD = "netdoc"
+
+
+def get_asyncssh():
+    try:
+        import asyncssh
+    except ImportError:
+        raise ImportError('Simulator requires asyncssh, install it with: pip install asyncssh')
+    return asyncssh
+
+
+class SimulatorOptions:
+    """
+    Simulator behaviour. Latencies are average seconds (+/- 50%), rates are
+    probabilities between 0 and 1, output size is the length in bytes of
+    outputs without a fixture.
+    """
+
+    def __init__(self, latency=0, login_latency=0, output_size=1024, auth_failure_rate=0, failure_rate=0, drop_rate=0):
+        self.latency = latency #: Per command
+        self.login_latency = login_latency #: Per login (AAA)
+        self.output_size = output_size
+        self.auth_failure_rate = auth_failure_rate #: Rejected logins
+        self.failure_rate = failure_rate #: Commands returning an error
+        self.drop_rate = drop_rate #: Commands closing the session
+
+    def delay(self, latency):
+        return random.uniform(latency * 0.5, latency * 1.5)
+
+
+class SimulatedDevice:
+    def __init__(self, address, platform, hostname, serial):
+        self.address = address
+        self.platform = platform
+        self.hostname = hostname
+        self.serial = serial
+
+    @property
+    def prompt(self):
+        return PROMPTS[self.platform].format(hostname=self.hostname)
+
+    def output(self, command, options):
+        """
+        Return the output of a command.
+        """
+        if command.startswith("terminal ") or command == "enable":
+            # Session setup, already privileged
+            return ""
+        if random.random() < options.failure_rate:
+            return INVALID_INPUT
+        output = FIXTURES[self.platform].get(command)
+        if output is None:
+            lines = []
+            while sum(len(line) + 1 for line in lines) < options.output_size:
+                lines.append(f'{self.hostname} {command} line {len(lines) + 1}')
+            output = "\n".join(lines)
+        return output.replace("{hostname}", self.hostname).replace("{serial}", self.serial)
+
+
+def get_devices(count, platforms=None, offset=0):
+    """
+    Return count simulated devices starting from offset, platforms are
+    assigned round robin.
+    """
+    if not platforms:
+        platforms = list(PROMPTS)
+    network = ipaddress.ip_network(PLUGIN_SETTINGS.get('SIMULATOR_NETWORK'))
+    devices = []
+    for i in range(offset, offset + count):
+        devices.append(SimulatedDevice(
+            address=str(network[i + 1]),
+            platform=platforms[i % len(platforms)],
+            hostname=f'sim-{i + 1}',
+            serial=f'SIM{i + 1:08d}',
+        ))
+    return devices
+
+
+@functools.lru_cache(maxsize=None)
+def get_server_class():
+    """
+    Return the asyncssh server class (asyncssh is imported on first use).
+    """
+    asyncssh = get_asyncssh()
+
+    class DeviceServer(asyncssh.SSHServer):
+        def __init__(self, options):
+            self.options = options
+
+        def begin_auth(self, username):
+            return True
+
+        def password_auth_supported(self):
+            return True
+
+        async def validate_password(self, username, password):
+            await asyncio.sleep(self.options.delay(self.options.login_latency))
+            if random.random() < self.options.auth_failure_rate:
+                return False
+            return username == USERNAME and password == PASSWORD
+
+    return DeviceServer
+
+
+async def handle_session(process, device, options):
+    """
+    Interactive CLI: echo is provided by the asyncssh line editor.
+    """
+    asyncssh = get_asyncssh()
+    process.stdout.write(f'\n{device.prompt}')
+    while True:
+        try:
+            line = await process.stdin.readline()
+        except (asyncssh.TerminalSizeChanged, asyncssh.BreakReceived):
+            continue
+        if not line:
+            break
+        command = line.strip()
+        if command in ("exit", "logout", "quit"):
+            break
+        if command:
+            await asyncio.sleep(options.delay(options.latency))
+            if random.random() < options.drop_rate:
+                logging.debug(f'Dropping session on {device.address}')
+                break
+            output = device.output(command, options)
+            if output:
+                process.stdout.write(output.rstrip("\n") + "\n")
+        process.stdout.write(device.prompt)
+    process.exit(0)
+
+
+async def serve(devices, options=None, port=None):
+    """
+    Start devices and serve them forever.
+    """
+    asyncssh = get_asyncssh()
+    options = options or SimulatorOptions()
+    if not port:
+        port = PLUGIN_SETTINGS.get('SSH_PORT')
+    server_class = get_server_class()
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+
+    for device in devices:
+        await asyncssh.create_server(
+            functools.partial(server_class, options),
+            device.address,
+            port,
+            server_host_keys=[host_key],
+            process_factory=functools.partial(handle_session, device=device, options=options),
+        )
+    logging.info(f'Simulating {len(devices)} devices on port {port}')
+    await asyncio.Event().wait()
+
+
+def create_discoverables(devices):
+    """
+    Create Discoverables for simulated devices (existing ones are kept).
+    Return their addresses.
+    """
+    credential, created = models.Credential.objects.get_or_create(name=NAME, defaults={"username": USERNAME, "password": PASSWORD})
+    site, created = Site.objects.get_or_create(slug=NAME, defaults={"name": "Simulator"})
+    models.Discoverable.objects.bulk_create([
+        models.Discoverable(address=device.address, mode=f'netmiko_{device.platform}', credential=credential, site=site, discoverable=True)
+        for device in devices
+    ], ignore_conflicts=True)
+    return [device.address for device in devices]
+
+
+def benchmark(devices, collector=None, profile=None):
+    """
+    Discover simulated devices with tasks.discovery and return statistics.
+    The simulator must be running in another process (see serve).
+    """
+    from . import tasks
+
+    addresses = create_discoverables(devices)
+    started_at = timezone.now()
+    start_time = time.monotonic()
+    tasks.discovery(addresses, collector=collector, profile=profile)
+    elapsed = time.monotonic() - start_time
+
+    logs = models.DiscoveryLog.objects.filter(created__gte=started_at, discoverable__address__in=addresses)
+    return {
+        "devices": len(devices),
+        "elapsed": elapsed,
+        "devices_per_second": len(devices) / elapsed if elapsed else None,
+        "logs": logs.count(),
+        "success": logs.filter(success=True).count(),
+        "parsed": logs.filter(parsed=True).count(),
+        "ingested": logs.filter(ingested=True).count(),
+    }
@@ -0,0 +1,101 @@
+"""
+Outputs served by the simulator (see simulator), by platform and command.
+
+{hostname} and {serial} are replaced with the values of each simulated device.
+Commands without a fixture return generated filler lines.
+"""
+
+PROMPTS = {
+    "cisco_ios": "{hostname}#",
+    "cisco_nxos": "{hostname}#",
+    "cisco_xr": "RP/0/RP0/CPU0:{hostname}#",
+}
+
+INVALID_INPUT = "% Invalid input detected at '^' marker."
+
+FIXTURES = {
+    "cisco_ios": {
+        "show version": """Cisco IOS Software, IOSv Software (VIOS-ADVENTERPRISEK9-M), Version 15.6(2)T, RELEASE SOFTWARE (fc2)
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 1986-2016 by Cisco Systems, Inc.
+Compiled Tue 22-Mar-16 16:19 by prod_rel_team
+
+
+ROM: Bootstrap program is IOSv
+
+{hostname} uptime is 1 hour, 5 minutes
+System returned to ROM by reload
+System image file is "flash0:/vios-adventerprisek9-m"
+Last reload reason: Unknown reason
+
+Cisco IOSv (revision 1.0) with  with 460017K/62464K bytes of memory.
+Processor board ID {serial}
+4 Gigabit Ethernet interfaces
+DRAM configuration is 72 bits wide with parity disabled.
+256K bytes of non-volatile configuration memory.
+2097152K bytes of ATA System CompactFlash 0 (Read/Write)
+
+Configuration register is 0x0
+""",
+        "show vrf": """  Name                             Default RD            Protocols   Interfaces
+""",
+        "show running-config | include Last configuration change": """! Last configuration change at 10:00:00 UTC Mon Jan 1 2024 by admin
+""",
+        "show ip arp": """Protocol  Address          Age (min)  Hardware Addr   Type   Interface
+Internet  10.0.0.1                -   5254.0000.0001  ARPA   GigabitEthernet0/0
+Internet  10.0.0.2                1   5254.0000.0002  ARPA   GigabitEthernet0/0
+""",
+    },
+    "cisco_nxos": {
+        "show version": """Cisco Nexus Operating System (NX-OS) Software
+TAC support: http://www.cisco.com/tac
+Copyright (C) 2002-2019, Cisco and/or its affiliates.
+All rights reserved.
+
+Software
+  BIOS: version
+  NXOS: version 9.3(3)
+  BIOS compile time:
+  NXOS image file is: bootflash:///nxos.9.3.3.bin
+  NXOS compile time:  12/22/2019 2:00:00 [12/22/2019 14:00:37]
+
+
+Hardware
+  cisco Nexus9000 C9300v Chassis
+  Intel(R) Xeon(R) CPU E5-2640 v4 @ 2.40GHz with 16409064 kB of memory.
+  Processor Board ID {serial}
+
+  Device name: {hostname}
+  bootflash: 4287040 kB
+Kernel uptime is 0 day(s), 1 hour(s), 5 minute(s), 0 second(s)
+""",
+        "show vrf": """VRF-Name                           VRF-ID State   Reason
+default                                 1 Up      --
+management                              2 Up      --
+""",
+        "show running-config | include last done": """!Running configuration last done at: Mon Jan  1 10:00:00 2024
+""",
+    },
+    "cisco_xr": {
+        "show version": """Cisco IOS XR Software, Version 6.5.3
+Copyright (c) 2013-2019 by Cisco Systems, Inc.
+
+Build Information:
+ Built By     : ahoang
+ Built On     : Tue Jun 11 22:48:35 PDT 2019
+ Built Host   : iox-ucs-027
+ Workspace    : /auto/srcarchive15/prod/6.5.3/xrv9k/ws
+ Version      : 6.5.3
+ Location     : /opt/cisco/XR/packages/
+
+cisco IOS-XRv 9000 () processor
+System uptime is 1 hour 5 minutes
+""",
+        "show vrf all": """VRF                  RD                  RT                         AFI   SAFI
+""",
+        "show configuration commit list 1": """SNo. Label/ID              User      Line                Client      Time Stamp
+~~~~ ~~~~~~~~              ~~~~      ~~~~                ~~~~~~      ~~~~~~~~~~
+1    1000000001            admin     vty0:node0_RP0_CPU0 CLI         Mon Jan  1 10:00:00 2024
+""",
+    },
+}
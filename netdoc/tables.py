@@ -57,10 +57,41 @@ class DiscoverableTable(NetBoxTable):
 
     class Meta(NetBoxTable.Meta):
         model = models.Discoverable
-        fields = ('pk', 'id', 'address', 'device', 'site', 'credential', 'mode', 'discoverable', 'last_discovered_at', 'discoverylogs_count')
+        fields = ('pk', 'id', 'address', 'device', 'site', 'credential', 'mode', 'profile', 'discoverable', 'last_discovered_at', 'discoverylogs_count')
         default_columns = ('address', 'device', 'site', 'credential', 'mode', 'discoverable', 'last_discovered_at', 'discoverylogs_count')
 
 
+#
+# Discovery run tables
+#
+
+class DiscoveryRunTable(NetBoxTable):
+    id = tables.Column(
+        linkify=True
+    )
+    status = ChoiceFieldColumn()
+    hosts_count = tables.Column()
+    actions = ActionsColumn(actions=('delete', )) # Read only objects
+
+    class Meta(NetBoxTable.Meta):
+        model = models.DiscoveryRun
+        fields = ('pk', 'id', 'created', 'last_updated', 'status', 'profile', 'queue', 'hosts_count')
+        default_columns = ('id', 'created', 'last_updated', 'status', 'profile', 'hosts_count')
+
+
+class DiscoveryRunHostTable(NetBoxTable):
+    discoverable = tables.Column(
+        linkify=True
+    )
+    status = ChoiceFieldColumn()
+    actions = ()
+
+    class Meta(NetBoxTable.Meta):
+        model = models.DiscoveryRunHost
+        fields = ('pk', 'id', 'discoverable', 'status', 'logs', 'parsed', 'ingested', 'last_updated')
+        default_columns = ('discoverable', 'status', 'logs', 'parsed', 'ingested', 'last_updated')
+
+
 #
 # Discovery log tables
 #
@@ -3,13 +3,82 @@ import django_rq
 import pprint
 
 from nornir.core.plugins.inventory import InventoryPluginRegister
+from nornir.core.plugins.runners import RunnersPluginRegister
 from .nornir_inventory import AssetInventory
+from .nornir_runners import AdaptiveThreadedRunner
 from nornir import InitNornir
-from nornir.core.filter import F
+from . import PLUGIN_SETTINGS
 from . import discovery_cisco_ios, discovery_cisco_nxos, discovery_cisco_xr
+from . import collector_asyncio
+from . import collector_replay
+from . import preflight
+from . import registry
+from . import runs
+from . import models
+from . import nornir_tasks
+from .pipeline import Pipeline, process_logs
 
 
-def discovery(addresses):
+def discovery(addresses, collector=None, profile=None, run_id=None, lease_deadline=None):
+    """
+    Discovery devices. Commands are selected using profile (see registry),
+    default is the profile of each Discoverable. If run_id is set, progress
+    is tracked in the DiscoveryRun (see runs) and hosts leased by other runs
+    are deferred to a job running after them (see coordinator.defer).
+    """
+    from . import coordinator
+
+    if profile:
+        # Fail early on unknown profiles
+        registry.get_profile(profile)
+
+    if not run_id:
+        collect(addresses, collector=collector, profile=profile)
+        return
+
+    runs.start(run_id)
+    deferred = []
+    try:
+        if not runs.is_canceled(run_id, refresh=True):
+            # Leases are renewed while collecting
+            with runs.lease(run_id, addresses) as (leased, held):
+                # Hosts not deferred in time are failed
+                deferred = coordinator.defer(run_id, held, lease_deadline=lease_deadline)
+                if leased:
+                    # Skip commands already collected (resumed run)
+                    collect(
+                        leased, collector=collector, profile=profile, run_id=run_id,
+                        exclude=runs.completed_commands(run_id), vrfs=runs.completed_vrfs(run_id),
+                    )
+    finally:
+        # Hosts not collected are failed (or canceled), leases are released
+        runs.finish(run_id, [address for address in addresses if address not in deferred])
+
+
+def collect(addresses, collector=None, profile=None, run_id=None, exclude=None, vrfs=None):
+    """
+    Collect, parse and ingest outputs using the configured collector.
+    Commands in exclude ({discoverable_id: names}) are skipped, VRF lists in
+    vrfs ({discoverable_id: vrfs}) are used if show vrf is skipped.
+    """
+    if not collector:
+        collector = PLUGIN_SETTINGS.get('COLLECTOR')
+    if collector == 'replay':
+        # Replay captured outputs (REPLAY_PATH), devices are not contacted
+        collector_replay.discovery(addresses, profile=profile, run_id=run_id, exclude=exclude, vrfs=vrfs)
+        return
+
+    if PLUGIN_SETTINGS.get('PREFLIGHT'):
+        # Discover reachable devices only
+        addresses = preflight.reachable(addresses, run_id=run_id)
+        if not addresses:
+            return
+
+    if collector == 'asyncio':
+        # Asyncio collector (Scrapli)
+        collector_asyncio.discovery(addresses, profile=profile, run_id=run_id, exclude=exclude, vrfs=vrfs)
+        return
+
     # Configuring Nornir
     logger = logging.getLogger("nornir")
     logger.setLevel(logging.DEBUG)
@@ -17,27 +86,61 @@ def discovery(addresses):
     fh.setLevel(logging.DEBUG)
     logger.addHandler(fh)
 
-    # Load Nornir custom inventory
+    # Load Nornir custom inventory and runner
     InventoryPluginRegister.register("asset-inventory", AssetInventory)
+    RunnersPluginRegister.register("adaptive-threaded", AdaptiveThreadedRunner)
 
     # Create Nornir inventory
     nr = InitNornir(
         runner={
-            "plugin": "threaded",
+            "plugin": "adaptive-threaded",
             "options": {
-                "num_workers": 100,
+                "num_workers": PLUGIN_SETTINGS.get('NUM_WORKERS'),
+            },
+        },
+        inventory={
+            "plugin": "asset-inventory",
+            "options": {
+                "addresses": addresses, # Execute on a selected hosts only
+                "profile": profile,
+                "run_id": run_id,
+                "exclude": exclude,
+                "vrfs": vrfs,
             },
         },
-        inventory={"plugin": "asset-inventory"},
         logging={"enabled": False},
     )
 
-    # Execute on a selected hosts only
-    # See https://theworldsgonemad.net/2021/nornir-inventory/
-    nr = nr.filter(F(hostname__in=addresses))
-
-    # Starting discovery job
+    # Starting discovery job, results are parsed and ingested while collecting
     pprint.pprint(nr.dict())
-    discovery_cisco_ios.discovery(nr)
-    discovery_cisco_nxos.discovery(nr)
-    discovery_cisco_xr.discovery(nr)
+    try:
+        with Pipeline(run_id=run_id) as pipeline:
+            discovery_cisco_ios.discovery(nr, pipeline=pipeline)
+            discovery_cisco_nxos.discovery(nr, pipeline=pipeline)
+            discovery_cisco_xr.discovery(nr, pipeline=pipeline)
+    finally:
+        # Close connections and release session slots
+        for host in nr.inventory.hosts.values():
+            nornir_tasks.close_connections(host)
+
+
+def ingest(discoverable_id, log_ids, run_id=None, final=True):
+    """
+    Parse and ingest logs stored by a collection job (see pipeline).
+    """
+    # Logs share the Discoverable, so updates of an ingestor are seen by the next ones
+    discoverable = models.Discoverable.objects.get(pk=discoverable_id)
+    logs = list(models.DiscoveryLog.objects.filter(pk__in=log_ids).order_by('pk'))
+    for log in logs:
+        log.discoverable = discoverable
+    process_logs(discoverable_id, logs, run_id=run_id, final=final)
+    if run_id:
+        runs.update_status(run_id)
+
+
+def ingest_failed(job, connection, type, value, traceback):
+    """
+    Fail the host of a failed last ingestion job (RQ on_failure callback).
+    """
+    discoverable_id = job.args[0]
+    runs.failed(job.kwargs.get('run_id'), discoverable_id)
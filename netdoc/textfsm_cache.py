@@ -0,0 +1,144 @@
+"""
+Compiled TextFSM template cache.
+
+Netmiko get_structured_data reads the ntc-templates index and reads and
+compiles the template on every call. Here the index (NTC_TEMPLATES_DIR) is
+read once and compiled templates are kept per platform and command, so
+parsing costs only the parse itself. The cache is cleared when the template
+directory or its index change (checked every TEXTFSM_CHECK_INTERVAL seconds).
+
+Templates are compiled for all platform commands when RQ workers start
+(warm), so forked job processes inherit them.
+"""
+import os
+import threading
+import time
+from textfsm import TextFSM
+from textfsm.clitable import CliTable
+from . import PLUGIN_SETTINGS
+
+
+INDEX_FILE = "index"
+
+
+class TemplateNotFound(Exception):
+    pass
+
+
+class TemplateCache:
+    def __init__(self, template_dir=None):
+        self.template_dir = template_dir
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # CliTable keeps indexes in a class attribute
+        CliTable.INDEX.pop(os.path.join(self.get_template_dir(), INDEX_FILE), None)
+        self.index = None
+        self.templates = {} # (platform, command): (TextFSM, lock)
+        self.version = None
+        self.checked_at = 0
+
+    def get_template_dir(self):
+        return self.template_dir or PLUGIN_SETTINGS.get('NTC_TEMPLATES_DIR')
+
+    def get_version(self):
+        """
+        Return the modification times of the template directory and index.
+        """
+        template_dir = self.get_template_dir()
+        return (os.stat(template_dir).st_mtime, os.stat(os.path.join(template_dir, INDEX_FILE)).st_mtime)
+
+    def check(self):
+        """
+        Clear the cache if templates changed (at most every
+        TEXTFSM_CHECK_INTERVAL seconds). Raise TemplateNotFound if the
+        template directory or index cannot be read.
+        """
+        now = time.monotonic()
+        if now - self.checked_at < PLUGIN_SETTINGS.get('TEXTFSM_CHECK_INTERVAL'):
+            return
+        try:
+            version = self.get_version()
+        except OSError as err:
+            # Missing NTC_TEMPLATES_DIR: callers fall back to Netmiko
+            self.clear()
+            raise TemplateNotFound(f'Cannot read templates: {err}')
+        if self.version is not None and version != self.version:
+            self.clear()
+        self.version = version
+        self.checked_at = now
+
+    def get(self, platform, command):
+        """
+        Return the compiled template of a command as (TextFSM, lock).
+        """
+        with self.lock:
+            self.check()
+            key = (platform, command)
+            if key not in self.templates:
+                try:
+                    if self.index is None:
+                        self.index = CliTable(INDEX_FILE, self.get_template_dir())
+                    row = self.index.index.GetRowMatch({"Platform": platform, "Command": command})
+                    if not row:
+                        raise TemplateNotFound(f'No template for {command} on {platform}')
+                    templates = self.index.index.index[row]["Template"].split(":")
+                    if len(templates) > 1:
+                        # Templates merged by CliTable are not supported
+                        raise TemplateNotFound(f'Multiple templates for {command} on {platform}')
+                    with open(os.path.join(self.get_template_dir(), templates[0]), encoding="utf-8") as fh:
+                        self.templates[key] = (TextFSM(fh), threading.Lock())
+                except OSError as err:
+                    # Index or template removed meanwhile
+                    raise TemplateNotFound(f'Cannot read template for {command} on {platform}: {err}')
+            return self.templates[key]
+
+    def parse(self, output, platform, command):
+        """
+        Parse an output, return a list of dicts with lowercase keys, or the
+        output itself if no row matches (as Netmiko get_structured_data).
+        """
+        fsm, lock = self.get(platform, command)
+        with lock:
+            # TextFSM objects hold the parsing state
+            fsm.Reset()
+            rows = fsm.ParseTextToDicts(output)
+        if not rows:
+            return output
+        return [{key.lower(): value for key, value in row.items()} for row in rows]
+
+    def warm(self, commands):
+        """
+        Compile templates for (platform, command) pairs, skipping commands
+        without a template. Return the number of compiled templates.
+        """
+        for platform, command in commands:
+            try:
+                self.get(platform, command)
+            except TemplateNotFound:
+                pass
+        return len(self.templates)
+
+
+CACHE = TemplateCache()
+
+
+def parse(output, platform, command):
+    return CACHE.parse(output, platform, command)
+
+
+def warm():
+    """
+    Compile templates for the commands of all platforms.
+    """
+    from . import registry
+    from .models import DiscoveryModeChoices
+
+    commands = []
+    for mode, label in DiscoveryModeChoices.CHOICES:
+        platform = "_".join(mode.split("_")[1:])
+        platform_module = registry.get_platform(platform)
+        for command in platform_module.COMMANDS + platform_module.vrf_commands(["default"]):
+            commands.append((platform, command.request))
+    return CACHE.warm(commands)
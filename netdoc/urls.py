@@ -46,6 +46,17 @@ urlpatterns = (
         'model': models.Discoverable
     }),
 
+    #
+    # DiscoveryRun urls
+    #
+
+    path('discoveryrun/', views.DiscoveryRunListView.as_view(), name='discoveryrun_list'),
+    path('discoveryrun/delete/', views.DiscoveryRunBulkDeleteView.as_view(), name='discoveryrun_bulk_delete'),
+    path('discoveryrun/<int:pk>/', views.DiscoveryRunView.as_view(), name='discoveryrun'),
+    path('discoveryrun/<int:pk>/delete/', views.DiscoveryRunDeleteView.as_view(), name='discoveryrun_delete'),
+    path('discoveryrun/<int:pk>/cancel/', views.DiscoveryRunCancelView.as_view(), name='discoveryrun_cancel'),
+    path('discoveryrun/<int:pk>/resume/', views.DiscoveryRunResumeView.as_view(), name='discoveryrun_resume'),
+
     #
     # DiscoveryLog urls
     #
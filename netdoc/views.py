@@ -35,7 +35,7 @@ from utilities.views import GetReturnURLMixin
 from netbox.views.generic.base import BaseMultiObjectView
 from utilities.utils import get_viewname, normalize_querydict, prepare_cloned_fields
 from django.urls import reverse
-from . import tasks
+from . import coordinator
 from . import filtersets
 
 
@@ -121,7 +121,8 @@ class DiscoverableView(generic.ObjectView):
     )
 
     def get_extra_context(self, request, instance):
-        table = tables.DiscoveryLogTable(instance.discoverylogs.all())
+        # Current state: latest log of each command
+        table = tables.DiscoveryLogTable(instance.discoverylogs.latest_by_command().defer('parsed_output'))
         table.configure(request)
 
         return {
@@ -215,11 +216,10 @@ class DiscoverableDiscoverView(generic.ObjectDeleteView):
             queryset = self.queryset.filter(pk=obj.pk)
             addresses = [obj.address]
 
-            # Starting discovery job on default queue
-            queue = django_rq.get_queue('default')
-            queue.enqueue(tasks.discovery, addresses)
+            # Starting discovery job on high priority queue
+            run_id = coordinator.enqueue_interactive(addresses)
 
-            msg = 'Stareted discovery on {}'.format(obj)
+            msg = 'Stareted discovery on {} (run {})'.format(obj, run_id)
             logger.info(msg)
             messages.success(request, msg)
 
@@ -285,11 +285,10 @@ class DiscoverableBulkDiscoverView(generic.BulkDeleteView):
                 discovery_count = queryset.count()
                 addresses = list(queryset.values_list('address', flat=True))
 
-                # Starting discovery job on default queue
-                queue = django_rq.get_queue('default')
-                queue.enqueue(tasks.discovery, addresses)
+                # Starting discovery jobs (one per shard) on default queue
+                run_id = coordinator.enqueue(addresses)
 
-                msg = f"Started discovery on {discovery_count} {model._meta.verbose_name_plural}"
+                msg = f"Started discovery on {discovery_count} {model._meta.verbose_name_plural} (run {run_id})"
                 logger.info(msg)
                 messages.success(request, msg)
                 return redirect(self.get_return_url(request))
@@ -318,12 +317,95 @@ class DiscoverableBulkDiscoverView(generic.BulkDeleteView):
         })
 
 
+#
+# DiscoveryRun views
+#
+
+class DiscoveryRunListView(generic.ObjectListView):
+    queryset = models.DiscoveryRun.objects.annotate(
+        hosts_count=Count('hosts')
+    )
+    table = tables.DiscoveryRunTable
+    actions = ('delete', 'bulk_delete')
+    filterset = filtersets.DiscoveryRunFilterSet
+
+
+class DiscoveryRunView(generic.ObjectView):
+    queryset = models.DiscoveryRun.objects.all()
+
+    def get_extra_context(self, request, instance):
+        table = tables.DiscoveryRunHostTable(instance.hosts.select_related('discoverable'))
+        table.configure(request)
+
+        return {
+            'hosts_table': table,
+            'status': coordinator.status(instance.pk),
+        }
+
+
+class DiscoveryRunDeleteView(generic.ObjectDeleteView):
+    queryset = models.DiscoveryRun.objects.all()
+
+
+class DiscoveryRunBulkDeleteView(generic.BulkDeleteView):
+    queryset = models.DiscoveryRun.objects.all()
+    table = tables.DiscoveryRunTable
+    default_return_url = 'netdoc:discoveryrun_list'
+
+
+class DiscoveryRunCancelView(generic.ObjectDeleteView):
+    """
+    Cancel a run.
+
+    Called from DiscoveryRunView clicking on the Cancel button.
+    """
+    queryset = models.DiscoveryRun.objects.all()
+
+    def get_required_permission(self):
+        return get_permission_for_model(self.queryset.model, 'change')
+
+    def get(self, request, *args, **kwargs):
+        return redirect(self.get_object(**kwargs).get_absolute_url())
+
+    def post(self, request, *args, **kwargs):
+        logger = logging.getLogger('netbox.plugins.netdoc')
+        obj = self.get_object(**kwargs)
+        coordinator.cancel(obj.pk)
+
+        msg = f'Canceled {obj}'
+        logger.info(msg)
+        messages.success(request, msg)
+        return redirect(obj.get_absolute_url())
+
+
+class DiscoveryRunResumeView(DiscoveryRunCancelView):
+    """
+    Resume a run.
+
+    Called from DiscoveryRunView clicking on the Resume button.
+    """
+
+    def post(self, request, *args, **kwargs):
+        logger = logging.getLogger('netbox.plugins.netdoc')
+        obj = self.get_object(**kwargs)
+        try:
+            coordinator.resume(obj.pk)
+        except coordinator.RunInProgress as err:
+            messages.warning(request, str(err))
+            return redirect(obj.get_absolute_url())
+
+        msg = f'Resumed {obj}'
+        logger.info(msg)
+        messages.success(request, msg)
+        return redirect(obj.get_absolute_url())
+
+
 #
 # DiscoveryLog views
 #
 
 class DiscoveryLogListView(generic.ObjectListView):
-    queryset = models.DiscoveryLog.objects.all()
+    queryset = models.DiscoveryLog.objects.defer('parsed_output') # Not shown in tables
     table = tables.DiscoveryLogTable
     actions = ('delete', 'bulk_delete')
     filterset = filtersets.DiscoveryLogFilterSet
@@ -339,7 +421,7 @@ class DiscoveryLogDeleteView(generic.ObjectDeleteView):
 
 
 class DiscoveryLogBulkDeleteView(generic.BulkDeleteView):
-    queryset = models.DiscoveryLog.objects.all()
+    queryset = models.DiscoveryLog.objects.defer('parsed_output')
     table = tables.DiscoveryLogTable
     default_return_url = 'netdoc:discoverylog_list'
 
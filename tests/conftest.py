@@ -0,0 +1,45 @@
+"""
+Tests run within a NetBox installation with NetDoc enabled (PLUGINS and
+PLUGINS_CONFIG in configuration.py) and pytest-django installed:
+
+    pip install pytest pytest-django
+    cd /opt/netbox/netbox
+    pytest --ds=netbox.settings /path/to/netdoc/tests
+
+Tests marked django_db use a test database created by pytest-django.
+"""
+import pytest
+from dcim.models import Site
+from netdoc.models import Credential, Discoverable
+from netdoc.simulator_fixtures import FIXTURES
+
+
+@pytest.fixture
+def site(db):
+    return Site.objects.create(name="Test site", slug="test-site")
+
+
+@pytest.fixture
+def credential(db):
+    return Credential.objects.create(name="test", username="admin", password="admin")
+
+
+@pytest.fixture
+def discoverable(site, credential):
+    return Discoverable.objects.create(
+        address="192.0.2.1",
+        credential=credential,
+        mode="netmiko_cisco_ios",
+        site=site,
+        discoverable=True,
+    )
+
+
+@pytest.fixture
+def fixture_output():
+    """
+    Return a function returning the simulator output of a command.
+    """
+    def get_output(platform, command, hostname="test-1", serial="TEST00000001"):
+        return FIXTURES[platform][command].replace("{hostname}", hostname).replace("{serial}", serial)
+    return get_output
@@ -0,0 +1,47 @@
+import pytest
+from netdoc import PLUGIN_SETTINGS
+from netdoc.adaptive import AdaptiveLimit
+
+
+def test_starts_from_maximum():
+    limit = AdaptiveLimit(20, minimum=5)
+    assert limit.limit == 20
+
+
+def test_minimum_not_above_maximum():
+    assert AdaptiveLimit(3, minimum=5).minimum == 3
+
+
+def test_decrease_on_failure():
+    limit = AdaptiveLimit(20, minimum=5)
+    limit.update(failed=True)
+    assert limit.limit == 15
+    for i in range(10):
+        limit.update(failed=True)
+    assert limit.limit == 5
+
+
+def test_decrease_on_slowdown():
+    limit = AdaptiveLimit(20, minimum=5)
+    limit.update(slowdown=PLUGIN_SETTINGS.get('SLOWDOWN_THRESHOLD'))
+    assert limit.limit == 20
+    limit.update(slowdown=PLUGIN_SETTINGS.get('SLOWDOWN_THRESHOLD') * 2)
+    assert limit.limit == 15
+
+
+def test_additive_increase():
+    limit = AdaptiveLimit(20, minimum=5)
+    limit.update(failed=True)
+    limit.update()
+    limit.update(slowdown=1.0)
+    assert limit.limit == 17
+    for i in range(10):
+        limit.update()
+    assert limit.limit == 20
+
+
+def test_login_slowdown():
+    limit = AdaptiveLimit(20, minimum=5)
+    assert limit.login_slowdown(2.0) == 1.0
+    assert limit.login_slowdown(8.0) == 4.0
+    assert limit.login_latency == pytest.approx(2.6)
@@ -0,0 +1,43 @@
+import pytest
+from netdoc import pipeline
+
+
+URL = "/api/plugins/netdoc/discoverylogs/"
+
+
+@pytest.fixture
+def logs(discoverable, fixture_output):
+    # Two discoveries of show version, the second with a failed show ip arp
+    first = pipeline.store(discoverable.pk, [
+        ("show version", fixture_output("cisco_ios", "show version"), 1.0),
+        ("show ip arp", fixture_output("cisco_ios", "show ip arp"), 1.0),
+    ], parse=False)
+    second = pipeline.store(discoverable.pk, [
+        ("show version", fixture_output("cisco_ios", "show version"), 1.0),
+        ("show ip arp", "% Invalid input detected at '^' marker.", 1.0),
+    ], parse=False)
+    return first + second
+
+
+@pytest.mark.django_db
+def test_list(admin_client, logs):
+    response = admin_client.get(URL)
+    assert response.status_code == 200
+    assert response.json()["count"] == 4
+    assert "raw_output" not in response.json()["results"][0]
+
+
+@pytest.mark.django_db
+def test_list_latest(admin_client, logs):
+    response = admin_client.get(URL, {"latest": "true"})
+    assert response.status_code == 200
+    # Latest show version, latest successful show ip arp
+    assert sorted(log["id"] for log in response.json()["results"]) == sorted([logs[2].pk, logs[1].pk])
+
+
+@pytest.mark.django_db
+def test_list_latest_include(admin_client, logs):
+    response = admin_client.get(URL, {"latest": "true", "discoverable_id": logs[0].discoverable_id, "include": "raw_output"})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
+    assert all("raw_output" in log for log in response.json()["results"])
@@ -0,0 +1,39 @@
+import pytest
+from netdoc import compression
+
+
+TEXT = "Internet  10.0.0.1                -   5254.0000.0001  ARPA   GigabitEthernet0/0\n" * 100
+
+
+def test_zlib_round_trip():
+    data = compression.compress(TEXT, codec="zlib")
+    assert len(data) < len(TEXT)
+    assert compression.decompress(data) == TEXT
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    data = compression.compress(TEXT, codec="zstd")
+    assert data.startswith(compression.ZSTD_MAGIC)
+    assert compression.decompress(data) == TEXT
+
+
+def test_decompress_memoryview():
+    # PostgreSQL returns memoryview
+    assert compression.decompress(memoryview(compression.compress(TEXT, codec="zlib"))) == TEXT
+
+
+def test_empty():
+    assert compression.compress("") == b''
+    assert compression.decompress(b'') == ''
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        compression.compress(TEXT, codec="lzma")
+
+
+def test_digest():
+    assert compression.digest(TEXT) == compression.digest(str(TEXT))
+    assert compression.digest(TEXT) != compression.digest(TEXT + "\n")
+    assert compression.digest(None) == compression.digest("")
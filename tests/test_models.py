@@ -0,0 +1,26 @@
+import pytest
+from django.db import transaction
+from netdoc import compression
+from netdoc.models import RawOutput
+
+
+@pytest.mark.django_db
+def test_for_texts_creates_once():
+    with transaction.atomic():
+        blobs = RawOutput.objects.for_texts(["a", "b", "a"])
+    assert set(blobs) == {compression.digest("a"), compression.digest("b")}
+    with transaction.atomic():
+        again = RawOutput.objects.for_texts(["a", "c"])
+    assert again[compression.digest("a")].pk == blobs[compression.digest("a")].pk
+    assert RawOutput.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_for_texts_after_prune():
+    with transaction.atomic():
+        blobs = RawOutput.objects.for_texts(["a"])
+    # Deleted as orphan
+    RawOutput.objects.filter(pk=blobs[compression.digest("a")].pk).delete()
+    with transaction.atomic():
+        blobs = RawOutput.objects.for_texts(["a"])
+    assert compression.decompress(RawOutput.objects.get(pk=blobs[compression.digest("a")].pk).data) == "a"
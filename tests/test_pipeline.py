@@ -0,0 +1,70 @@
+import pytest
+from netdoc import pipeline
+from netdoc import registry
+from netdoc import tasks
+from netdoc.discovery_cisco_ios import FINGERPRINT
+from netdoc.models import ArpTableEntry, Discoverable, DiscoveryLog
+from netdoc.simulator_fixtures import INVALID_INPUT
+
+
+@pytest.fixture
+def results(fixture_output):
+    # Results in execution order: show version before tables
+    return [
+        ("show version", fixture_output("cisco_ios", "show version"), 1.0),
+        ("show ip arp", fixture_output("cisco_ios", "show ip arp"), 1.0),
+    ]
+
+
+def assert_ingested(discoverable):
+    discoverable.refresh_from_db()
+    assert discoverable.device is not None
+    assert discoverable.device.name == "test-1"
+    logs = DiscoveryLog.objects.filter(discoverable=discoverable).order_by('pk')
+    assert [log.request for log in logs] == ["show version", "show ip arp"]
+    assert all(log.parsed and log.ingested for log in logs)
+    assert ArpTableEntry.objects.filter(interface__device=discoverable.device).count() == 2
+
+
+@pytest.mark.django_db
+def test_first_discovery_ingested_in_order(discoverable, results):
+    # The Device is created by show version and used by show ip arp
+    assert discoverable.device is None
+    pipeline.ingest(discoverable.pk, results)
+    assert_ingested(discoverable)
+
+
+@pytest.mark.django_db
+def test_first_discovery_ingested_in_order_by_job(discoverable, results):
+    # Same as enqueue_ingest followed by the ingestion job
+    logs = pipeline.store(discoverable.pk, results, parse=False)
+    tasks.ingest(discoverable.pk, [log.pk for log in logs])
+    assert_ingested(discoverable)
+
+
+@pytest.fixture
+def fingerprint_results(fixture_output):
+    # A protocol not configured on the device
+    return [
+        (FINGERPRINT.name, fixture_output("cisco_ios", FINGERPRINT.command_string), 1.0),
+        ("show version", fixture_output("cisco_ios", "show version"), 1.0),
+        ("show glbp", INVALID_INPUT, 1.0),
+    ]
+
+
+@pytest.mark.django_db
+def test_fingerprint_recorded_with_failed_command(discoverable, fingerprint_results):
+    # show glbp never succeeded on the device
+    pipeline.store(discoverable.pk, fingerprint_results, parse=False)
+    discoverable = Discoverable.objects.get(pk=discoverable.pk)
+    assert discoverable.fingerprint
+    assert registry.FINGERPRINT in discoverable.last_discovered_by_class
+
+
+@pytest.mark.django_db
+def test_fingerprint_not_recorded_if_command_fails(discoverable, fingerprint_results):
+    # show glbp succeeded in an earlier discovery
+    pipeline.store(discoverable.pk, [("show glbp", "GigabitEthernet0/0 - Group 1\n  State is Active", 1.0)], parse=False)
+    pipeline.store(discoverable.pk, fingerprint_results, parse=False)
+    discoverable = Discoverable.objects.get(pk=discoverable.pk)
+    assert discoverable.fingerprint == ""
@@ -0,0 +1,22 @@
+import pytest
+from netdoc.ratelimit import TokenBucket
+
+
+def test_burst_up_to_rate():
+    bucket = TokenBucket(5)
+    assert [bucket.reserve() for i in range(5)] == [0] * 5
+
+
+def test_wait_after_burst():
+    bucket = TokenBucket(2)
+    bucket.reserve()
+    bucket.reserve()
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.05)
+    # Reservations queue up
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_slow_rate_holds_one_token():
+    bucket = TokenBucket(0.5)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
@@ -0,0 +1,94 @@
+import datetime
+from types import SimpleNamespace
+import pytest
+from netdoc import PLUGIN_SETTINGS
+from netdoc import registry
+from netdoc.registry import Command
+
+
+COMMANDS = [
+    Command("show version", "show version", registry.INVENTORY),
+    Command("show running-config", "show running-config", registry.CONFIG, cost=registry.EXPENSIVE),
+    Command("show vrf", "show vrf", registry.VRF),
+    Command("show ip arp", "show ip arp", registry.ARP),
+    Command("show ip route", "show ip route", registry.ROUTE, cost=registry.EXPENSIVE),
+]
+
+
+def names(commands):
+    return [command.name for command in commands]
+
+
+def test_select_full():
+    assert names(registry.select(COMMANDS, profile="full")) == names(COMMANDS)
+
+
+def test_select_fast_skips_expensive():
+    assert names(registry.select(COMMANDS, profile="fast")) == ["show version", "show vrf", "show ip arp"]
+
+
+def test_select_classes_include_inventory():
+    # Tables are ingested on the Device found by show version
+    assert names(registry.select(COMMANDS, profile="l2-fast")) == ["show version", "show vrf", "show ip arp"]
+    assert names(registry.select(COMMANDS, profile="routing")) == ["show version", "show vrf", "show ip route"]
+
+
+def test_select_skip_classes():
+    skip_classes = [registry.INVENTORY, registry.CONFIG]
+    assert names(registry.select(COMMANDS, profile="full", skip_classes=skip_classes)) == ["show vrf", "show ip arp", "show ip route"]
+
+
+def test_select_exclude():
+    assert names(registry.select(COMMANDS, profile="fast", exclude=["show vrf"])) == ["show version", "show ip arp"]
+
+
+def test_select_unknown_profile():
+    with pytest.raises(registry.UnknownProfile):
+        registry.select(COMMANDS, profile="missing")
+
+
+def test_profile_for(monkeypatch):
+    monkeypatch.setitem(PLUGIN_SETTINGS, 'DEFAULT_PROFILE', "full")
+    monkeypatch.setitem(PLUGIN_SETTINGS, 'SITE_PROFILES', {"branch": "fast"})
+    site = SimpleNamespace(slug="branch")
+    other_site = SimpleNamespace(slug="datacenter")
+
+    assert registry.profile_for(SimpleNamespace(profile="routing", site=site)) == "routing"
+    assert registry.profile_for(SimpleNamespace(profile="", site=site)) == "fast"
+    assert registry.profile_for(SimpleNamespace(profile="", site=other_site)) == "full"
+
+
+def test_use_fingerprint(monkeypatch):
+    monkeypatch.setitem(PLUGIN_SETTINGS, 'FINGERPRINT', True)
+    # Expensive fingerprint, used only if it skips expensive commands
+    assert registry.use_fingerprint("cisco_ios", profile="full")
+    assert not registry.use_fingerprint("cisco_ios", profile="l2-fast")
+    assert not registry.use_fingerprint("cisco_ios", profile="fast")
+    # Cheap fingerprint
+    assert registry.use_fingerprint("cisco_xr", profile="l2-fast")
+    monkeypatch.setitem(PLUGIN_SETTINGS, 'FINGERPRINT', False)
+    assert not registry.use_fingerprint("cisco_ios", profile="full")
+
+
+def test_get_skipped_classes(monkeypatch):
+    monkeypatch.setitem(PLUGIN_SETTINGS, 'FINGERPRINT_MAX_AGE', 3600)
+    now = datetime.datetime(2024, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    recorded_at = now - datetime.timedelta(minutes=30)
+    last_discovered_by_class = {
+        registry.FINGERPRINT: recorded_at.isoformat(),
+        registry.CONFIG: recorded_at.isoformat(), # Collected with the fingerprint
+        registry.INVENTORY: (recorded_at + datetime.timedelta(minutes=10)).isoformat(),
+        registry.NEIGHBORS: (recorded_at - datetime.timedelta(minutes=10)).isoformat(), # Not collected since
+        registry.ARP: recorded_at.isoformat(), # Volatile
+    }
+
+    assert registry.get_skipped_classes("abc", "abc", last_discovered_by_class, now=now) == {registry.CONFIG, registry.INVENTORY}
+    assert registry.get_skipped_classes("abc", "def", last_discovered_by_class, now=now) == set()
+    assert registry.get_skipped_classes(None, "", last_discovered_by_class, now=now) == set()
+    # Fingerprint not recorded
+    assert registry.get_skipped_classes("abc", "abc", {registry.CONFIG: recorded_at.isoformat()}, now=now) == set()
+    # Max age
+    later = now + datetime.timedelta(minutes=35)
+    assert registry.get_skipped_classes("abc", "abc", last_discovered_by_class, now=later) == {registry.INVENTORY}
+    monkeypatch.setitem(PLUGIN_SETTINGS, 'FINGERPRINT_MAX_AGE', None)
+    assert registry.get_skipped_classes("abc", "abc", last_discovered_by_class, now=later) == {registry.CONFIG, registry.INVENTORY}
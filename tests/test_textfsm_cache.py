@@ -0,0 +1,44 @@
+import pytest
+from netmiko.utilities import get_structured_data
+from netdoc.simulator_fixtures import FIXTURES
+from netdoc.textfsm_cache import TemplateCache, TemplateNotFound
+
+
+@pytest.mark.parametrize("platform,command", [
+    (platform, command) for platform, outputs in FIXTURES.items() for command in outputs
+])
+def test_parse_as_netmiko(platform, command, fixture_output):
+    cache = TemplateCache()
+    output = fixture_output(platform, command)
+    try:
+        parsed_output = cache.parse(output, platform, command)
+    except TemplateNotFound:
+        pytest.skip(f'No single template for {command} on {platform}')
+    assert parsed_output == get_structured_data(output, platform=platform, command=command)
+
+
+def test_templates_are_cached(fixture_output):
+    cache = TemplateCache()
+    output = fixture_output("cisco_ios", "show ip arp")
+    cache.parse(output, "cisco_ios", "show ip arp")
+    fsm, lock = cache.templates[("cisco_ios", "show ip arp")]
+    assert len(cache.parse(output, "cisco_ios", "show ip arp")) == 2
+    assert cache.templates[("cisco_ios", "show ip arp")][0] is fsm
+
+
+def test_unknown_command():
+    with pytest.raises(TemplateNotFound):
+        TemplateCache().parse("", "cisco_ios", "show unknown command")
+
+
+def test_missing_template_dir(tmp_path):
+    with pytest.raises(TemplateNotFound):
+        TemplateCache(template_dir=str(tmp_path / "missing")).parse("", "cisco_ios", "show version")
+
+
+@pytest.mark.parametrize("output", ["", "% Invalid input detected at '^' marker.", "no matching lines"])
+def test_no_rows_as_netmiko(output):
+    # Unparsed output is returned as is, so the log is not marked parsed
+    parsed_output = TemplateCache().parse(output, "cisco_ios", "show ip arp")
+    assert parsed_output == output
+    assert parsed_output == get_structured_data(output, platform="cisco_ios", command="show ip arp")